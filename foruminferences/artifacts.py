@@ -0,0 +1,426 @@
+import fcntl
+import json
+import os
+
+from contextlib import contextmanager
+
+from inferencebackend.settings import INFERENCES_FILE_LOCATION, INFERENCE_CHECKPOINT_INTERVAL
+
+def inference_file_name(forum_obj):
+    '''
+    Name of the inference file for a forum (relative to INFERENCES_FILE_LOCATION)
+    '''
+
+    return f'{forum_obj.get_file_name()}_inferences.json'
+
+class QuestionNotInferred(Exception):
+    '''
+    Raised when a requested question has no inferences in an inference file
+    '''
+
+class InferenceInProgress(Exception):
+    '''
+    Raised when another inference job holds a forum's lock
+    '''
+
+class InferencesExist(Exception):
+    '''
+    Raised when an inference job starts for a forum that already has inferences
+    '''
+
+class InferenceLock:
+    '''
+    Exclusive per-forum lock held for the whole of an inference job, so two
+    jobs never append to the same checkpoint or save two ForumInferences.
+
+    The lock file next to the inference file is locked with flock rather than
+    only created, so the lock goes away with a process that dies mid job and
+    the job can be resumed straight away.
+    '''
+
+    def __init__(self, file_name):
+        self.location = f'{INFERENCES_FILE_LOCATION}{file_name}.lock'
+
+        self._fd = None
+
+    def acquire(self):
+        '''
+        Raises:
+            InferenceInProgress: another job holds the lock
+        '''
+
+        while True:
+            fd = os.open(self.location, os.O_RDWR | os.O_CREAT)
+
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+
+                raise InferenceInProgress(f'{self.location} is held by another job')
+
+            # the last holder may have removed the file between open and flock
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.location).st_ino:
+                    self._fd = fd
+
+                    return
+            except FileNotFoundError:
+                pass
+
+            os.close(fd)
+
+    def release(self):
+        if self._fd is None:
+            return
+
+        # removed while still locked, so nobody can lock the old file after us
+        os.remove(self.location)
+        os.close(self._fd)
+
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+def remove_inference_progress(file_name):
+    '''
+    Delete the checkpoint and temporary file an unfinished inference job left
+    next to the inference file
+    '''
+
+    for suffix in ('.checkpoint', '.tmp'):
+        location = f'{INFERENCES_FILE_LOCATION}{file_name}{suffix}'
+
+        if os.path.exists(location):
+            os.remove(location)
+
+def write_inferences_atomic(file_location, questions, inferences):
+    '''
+    Write an inference file to a temporary file and rename it into place, so
+    readers and retries never see a partially written file.
+
+    The file is regular JSON laid out with one post per line, so it can be
+    read back one post at a time (see open_inferences).
+
+    Args:
+        file_location: path of the final file
+        questions: list of questions
+        inferences: iterable of (post id, list of inferences), written as it is consumed
+    '''
+
+    temp_location = f'{file_location}.tmp'
+
+    with open(temp_location, 'w') as temp_file:
+        temp_file.write('{\n')
+        temp_file.write(f'"questions": {json.dumps(questions)},\n')
+        temp_file.write('"inferences": {\n')
+
+        for post_ind, (post_id, answers) in enumerate(inferences):
+            if post_ind:
+                temp_file.write(',\n')
+
+            temp_file.write(f'{json.dumps(str(post_id))}: {json.dumps(answers)}')
+
+        temp_file.write('\n}\n}\n')
+
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+
+    os.replace(temp_location, file_location)
+
+def _parse_member(line):
+    # a line holds a single "key": value member of the outer object
+    return json.loads('{' + line.rstrip().rstrip(',') + '}')
+
+def _iter_post_lines(inference_file):
+    for line in inference_file:
+        if line.startswith('}'):
+            return
+
+        if line.strip():
+            yield next(iter(_parse_member(line).items()))
+
+@contextmanager
+def open_inferences(file_location):
+    '''
+    Open an inference file for reading one post at a time
+
+    Args:
+        file_location: path of the inference file
+
+    Yields:
+        Tuple of (list of questions, iterator of (post id, list of inferences))
+    '''
+
+    with open(file_location) as inference_file:
+        first_line = inference_file.readline()
+
+        # files written before the one post per line layout are a single line
+        if first_line != '{\n':
+            inferences = json.loads(first_line + inference_file.read())
+
+            yield inferences['questions'], iter(inferences['inferences'].items())
+
+            return
+
+        questions = _parse_member(inference_file.readline())['questions']
+
+        inference_file.readline() # "inferences": {
+
+        yield questions, _iter_post_lines(inference_file)
+
+def iter_inferences_json(file_location, **extra_fields):
+    '''
+    Serialize an inference file as JSON one post at a time
+
+    Args:
+        file_location: path of the inference file
+        **extra_fields: extra members added to the JSON object
+
+    Yields:
+        Chunks of the JSON text of questions, inferences and extra_fields
+    '''
+
+    with open_inferences(file_location) as (questions, posts):
+        yield f'{{"questions": {json.dumps(questions)}, "inferences": {{'
+
+        for post_ind, (post_id, answers) in enumerate(posts):
+            yield f'{", " if post_ind else ""}{json.dumps(post_id)}: {json.dumps(answers)}'
+
+        yield '}'
+
+    for key, value in extra_fields.items():
+        yield f', {json.dumps(key)}: {json.dumps(value)}'
+
+    yield '}'
+
+def slice_inferences(
+    file_location,
+    questions=None,
+    post_id_start=None,
+    post_id_end=None,
+    page=None,
+    page_size=None,
+    include_embeddings=True
+):
+    '''
+    Read part of an inference file, keeping only the selected posts and
+    questions in memory
+
+    Args:
+        file_location: path of the inference file
+        questions (optional): list of questions to keep, defaults to all
+        post_id_start (optional): smallest post id to keep
+        post_id_end (optional): largest post id to keep
+        page (optional): 1-indexed page of posts (after post id filtering)
+        page_size (optional): posts per page
+        include_embeddings: keep answer_embedding in each inference
+
+    Returns:
+        Dictionary
+            - questions
+            - inferences: post id -> list of inferences (one per selected question)
+            - page (only when paging): number, size, has_more
+    '''
+
+    with open_inferences(file_location) as (inferenced_questions, posts):
+        questions = questions or inferenced_questions
+
+        for question in questions:
+            if question not in inferenced_questions:
+                raise QuestionNotInferred(question)
+
+        question_inds = [inferenced_questions.index(question) for question in questions]
+
+        first_post = (page - 1) * page_size if page else 0
+        matched_posts = 0
+        has_more = False
+
+        inferences = {}
+
+        for post_id, answers in posts:
+            if post_id_start is not None and int(post_id) < post_id_start:
+                continue
+
+            if post_id_end is not None and int(post_id) > post_id_end:
+                continue
+
+            matched_posts += 1
+
+            if matched_posts <= first_post:
+                continue
+
+            if page and len(inferences) == page_size:
+                has_more = True
+
+                break
+
+            selected_answers = [answers[question_ind] for question_ind in question_inds]
+
+            if not include_embeddings:
+                selected_answers = [
+                    {key: value for key, value in answer.items() if key != 'answer_embedding'}
+                    for answer in selected_answers
+                ]
+
+            inferences[post_id] = selected_answers
+
+    sliced_inferences = {
+        'questions': questions,
+        'inferences': inferences
+    }
+
+    if page:
+        sliced_inferences['page'] = {
+            'number': page,
+            'size': page_size,
+            'has_more': has_more
+        }
+
+    return sliced_inferences
+
+class InferenceCheckpoint:
+    '''
+    Append-only record of finished posts for an inference job.
+
+    The checkpoint is a JSON lines file next to the inference file. The first
+    line holds the questions and job options, every other line holds the
+    answers for one post.
+    Lines are flushed to disk every INFERENCE_CHECKPOINT_INTERVAL posts, so a
+    job that dies loses at most that many posts.
+    '''
+
+    def __init__(self, file_name, questions, options=None, interval=INFERENCE_CHECKPOINT_INTERVAL):
+        self.location = f'{INFERENCES_FILE_LOCATION}{file_name}.checkpoint'
+        self.header = {'questions': questions, 'options': options or {}}
+        self.interval = interval
+
+        self._file = None
+        self._pending = 0
+
+    def load(self):
+        '''
+        Find finished posts from a previous run with the same questions and options
+
+        Returns:
+            Set of finished post ids
+        '''
+
+        completed = set()
+
+        if not os.path.exists(self.location):
+            return completed
+
+        with open(self.location, 'r+b') as checkpoint_file:
+            header_line = checkpoint_file.readline()
+
+            try:
+                header = json.loads(header_line) if header_line.endswith(b'\n') else {}
+            except ValueError:
+                header = {}
+
+            # a checkpoint for other questions or options can't be resumed
+            if header != self.header:
+                checkpoint_file.close()
+                os.remove(self.location)
+
+                return completed
+
+            valid_bytes = len(header_line)
+
+            for line in checkpoint_file:
+                # last line may be cut off mid write
+                if not line.endswith(b'\n'):
+                    break
+
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+
+                completed.add(record['post_id'])
+                valid_bytes += len(line)
+
+            # drop a cut off line so new records start on a fresh line
+            checkpoint_file.truncate(valid_bytes)
+
+        return completed
+
+    def iter_records(self):
+        '''
+        Read finished posts back in the order they were recorded
+
+        Yields:
+            Tuple of (post id, list of inferences)
+        '''
+
+        self.flush()
+
+        if not os.path.exists(self.location):
+            return
+
+        with open(self.location) as checkpoint_file:
+            checkpoint_file.readline() # header
+
+            for line in checkpoint_file:
+                record = json.loads(line)
+
+                yield record['post_id'], record['answers']
+
+    def append(self, post_id, answers):
+        '''
+        Record the answers for a finished post
+        '''
+
+        if self._file is None:
+            is_new = not os.path.exists(self.location)
+
+            self._file = open(self.location, 'a')
+
+            if is_new:
+                self._file.write(json.dumps(self.header) + '\n')
+
+        self._file.write(json.dumps({'post_id': post_id, 'answers': answers}) + '\n')
+        self._pending += 1
+
+        if self._pending >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self._file is None:
+            return
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        self._pending = 0
+
+    def close(self):
+        '''
+        Write every recorded post to disk and close the checkpoint, so nothing
+        is left buffered once the job lets go of the forum's lock
+        '''
+
+        if self._file is None:
+            return
+
+        self.flush()
+
+        self._file.close()
+        self._file = None
+
+    def remove(self):
+        '''
+        Delete the checkpoint once the inference file has been written
+        '''
+
+        self.close()
+
+        if os.path.exists(self.location):
+            os.remove(self.location)
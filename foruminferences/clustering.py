@@ -0,0 +1,153 @@
+import numpy as np
+
+from scipy.sparse import csgraph, csr_matrix
+
+# rows of the similarity matrix computed at once, bounds memory to BLOCK_SIZE x N
+BLOCK_SIZE = 512
+
+def normalized_embedding_matrix(inferences_dict, question_ind):
+    '''
+    Build a matrix of unit length answer embeddings for a question, leaving
+    out posts skipped by retrieval
+
+    Args:
+        inferences_dict: dictionary of post id -> list of inferences
+        question_ind: index of the question in each list of inferences
+
+    Returns:
+        Tuple of (list of post ids, float32 matrix with one row per post)
+    '''
+
+    post_ids = [
+        post_id for post_id, answers in inferences_dict.items()
+        if not answers[question_ind].get('skipped')
+    ]
+
+    if not post_ids:
+        return post_ids, np.zeros((0, 0), dtype=np.float32)
+
+    embeddings = np.array(
+        [inferences_dict[post_id][question_ind]['answer_embedding'] for post_id in post_ids],
+        dtype=np.float32
+    )
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    return post_ids, embeddings / np.maximum(norms, 1e-12)
+
+def connected_components(embeddings, similarity):
+    '''
+    Group rows whose cosine similarity is greater than a threshold,
+    following similarity transitively
+
+    Args:
+        embeddings: matrix of unit length embeddings
+        similarity: cosine similarity threshold
+
+    Returns:
+        List of clusters, each a list of row indices
+    '''
+
+    num_rows = embeddings.shape[0]
+
+    if not num_rows:
+        return []
+
+    edge_rows = []
+    edge_cols = []
+
+    for block_start in range(0, num_rows, BLOCK_SIZE):
+        block = embeddings[block_start:block_start + BLOCK_SIZE]
+
+        # only compare against later rows, the matrix is symmetric
+        similarities = block @ embeddings[block_start:].T
+
+        rows, cols = np.nonzero(similarities > similarity)
+
+        edge_rows.append(rows + block_start)
+        edge_cols.append(cols + block_start)
+
+    # components of the sparse adjacency matrix are found in compiled code
+    edge_rows = np.concatenate(edge_rows)
+    edge_cols = np.concatenate(edge_cols)
+
+    adjacency = csr_matrix(
+        (np.ones(len(edge_rows), dtype=np.int8), (edge_rows, edge_cols)),
+        shape=(num_rows, num_rows)
+    )
+
+    _, labels = csgraph.connected_components(adjacency, directed=False)
+
+    clusters = {}
+
+    for row, label in enumerate(labels.tolist()):
+        clusters.setdefault(label, []).append(row)
+
+    return list(clusters.values())
+
+def greedy_centroid_clusters(embeddings, similarity):
+    '''
+    Assign each row to the most similar existing cluster centroid if it is
+    greater than a threshold, otherwise start a new cluster
+
+    Args:
+        embeddings: matrix of unit length embeddings
+        similarity: cosine similarity threshold
+
+    Returns:
+        List of clusters, each a list of row indices
+    '''
+
+    clusters = []
+    centroid_sums = np.zeros_like(embeddings)
+    centroids = np.zeros_like(embeddings)
+
+    for row, embedding in enumerate(embeddings):
+        if clusters:
+            similarities = centroids[:len(clusters)] @ embedding
+            best = int(np.argmax(similarities))
+
+            if similarities[best] > similarity:
+                clusters[best].append(row)
+                centroid_sums[best] += embedding
+                centroids[best] = centroid_sums[best] / max(np.linalg.norm(centroid_sums[best]), 1e-12)
+
+                continue
+
+        centroid_sums[len(clusters)] = embedding
+        centroids[len(clusters)] = embedding
+        clusters.append([row])
+
+    return clusters
+
+CLUSTER_METHODS = {
+    'components': connected_components,
+    'centroid': greedy_centroid_clusters,
+}
+
+def cluster_posts(inferences_dict, question_ind, similarity, method='components'):
+    '''
+    Cluster every post of a forum by answer similarity for a question. Posts
+    skipped by retrieval have no answer and are left out.
+
+    Args:
+        inferences_dict: dictionary of post id -> list of inferences
+        question_ind: index of the question in each list of inferences
+        similarity: cosine similarity threshold
+        method: key of CLUSTER_METHODS
+
+    Returns:
+        List of clusters (largest first), each a list of post ids
+    '''
+
+    post_ids, embeddings = normalized_embedding_matrix(inferences_dict, question_ind)
+
+    if not post_ids:
+        return []
+
+    clusters = CLUSTER_METHODS[method](embeddings, similarity)
+
+    clusters = [[post_ids[row] for row in cluster] for cluster in clusters]
+    clusters.sort(key=len, reverse=True)
+
+    return clusters
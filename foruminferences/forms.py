@@ -1,8 +1,48 @@
 from django import forms
 
+from inferencebackend.settings import MODEL_TIERS
+
+MODEL_TIER_CHOICES = [(model_tier, model_tier) for model_tier in MODEL_TIERS]
+
+class InferencesForm(forms.Form):
+    retrieval_threshold = forms.FloatField(required=False)
+    retrieval_top_k = forms.IntegerField(min_value=1, required=False)
+
+    model_tier = forms.ChoiceField(choices=MODEL_TIER_CHOICES, required=False)
+
+    stream = forms.NullBooleanField(required=False)
+
+class QuestionInferenceForm(forms.Form):
+    model_tier = forms.ChoiceField(choices=MODEL_TIER_CHOICES, required=False)
+
+class InferencesQueryForm(forms.Form):
+    forum_id = forms.UUIDField()
+
+    post_id_start = forms.IntegerField(required=False)
+    post_id_end = forms.IntegerField(required=False)
+
+    page = forms.IntegerField(min_value=1, required=False)
+    page_size = forms.IntegerField(min_value=1, required=False)
+
+    include_embeddings = forms.NullBooleanField(required=False)
+
 class PostRelationsForm(forms.Form):
     forum_id = forms.UUIDField()
     post_id = forms.IntegerField()
     
     question = forms.CharField()
     similarity = forms.FloatField()
+
+    model_tier = forms.ChoiceField(choices=MODEL_TIER_CHOICES, required=False)
+
+class PostClustersForm(forms.Form):
+    forum_id = forms.UUIDField()
+
+    question = forms.CharField()
+    similarity = forms.FloatField()
+    method = forms.ChoiceField(
+        choices=[('components', 'components'), ('centroid', 'centroid')],
+        required=False
+    )
+
+    model_tier = forms.ChoiceField(choices=MODEL_TIER_CHOICES, required=False)
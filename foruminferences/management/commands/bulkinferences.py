@@ -0,0 +1,161 @@
+import json
+import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from inferencebackend.settings import DEFAULT_MODEL_TIER, INFERENCE_WORKERS, MODEL_TIERS
+
+from forums.models import Forums
+
+from foruminferences.artifacts import InferenceInProgress, InferencesExist
+from foruminferences.models import ForumInferences
+from foruminferences.ml import load_models
+from foruminferences.views import create_forum_inferences
+
+def read_questions(questions_file):
+    '''
+    Read questions from a JSON list or a text file with one question per line
+    '''
+
+    with open(questions_file) as file:
+        contents = file.read()
+
+    try:
+        questions = json.loads(contents)
+    except ValueError:
+        questions = None
+
+    if not isinstance(questions, list):
+        questions = [line.strip() for line in contents.splitlines() if line.strip()]
+
+    return questions
+
+class Command(BaseCommand):
+    help = (
+        'Make inferences for many forums offline. Forums that already have '
+        'inferences are skipped and interrupted forums resume from their '
+        'checkpoint, so the command can be rerun after a failure.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'questions_file',
+            help='JSON list of questions or a text file with one question per line'
+        )
+        parser.add_argument(
+            '--forum-ids',
+            nargs='+',
+            default=None,
+            help='ids of forums to make inferences for (default: every forum without inferences)'
+        )
+        parser.add_argument('--workers', type=int, default=INFERENCE_WORKERS)
+        parser.add_argument('--model-tier', choices=list(MODEL_TIERS), default=DEFAULT_MODEL_TIER)
+        parser.add_argument('--retrieval-threshold', type=float, default=None)
+        parser.add_argument('--retrieval-top-k', type=int, default=None)
+
+    def handle(self, *args, **options):
+        questions = read_questions(options['questions_file'])
+
+        if not questions:
+            raise CommandError('No questions in questions file')
+
+        forums = Forums.objects.exclude(
+            id__in=ForumInferences.objects.values('forum')
+        )
+
+        if options['forum_ids']:
+            forum_ids = []
+
+            for forum_id in options['forum_ids']:
+                try:
+                    forum_ids.append(uuid.UUID(forum_id))
+                except ValueError:
+                    raise CommandError(f'Invalid forum id: {forum_id}')
+
+            forums = forums.filter(id__in=forum_ids)
+
+        forums = list(forums)
+
+        if not forums:
+            self.stdout.write('No forums need inferences')
+
+            return
+
+        retrieval_options = {
+            'retrieval_threshold': options['retrieval_threshold'],
+            'retrieval_top_k': options['retrieval_top_k']
+        }
+
+        self.stdout.write(f'Making inferences for {len(forums)} forums')
+
+        # every worker shares the same loaded models
+        models = load_models(options['model_tier'])
+
+        def run(forum_obj):
+            start_time = time.perf_counter()
+
+            close_old_connections()
+
+            try:
+                _, num_posts, qa_calls_saved = create_forum_inferences(
+                    forum_obj,
+                    questions,
+                    retrieval_options,
+                    options['model_tier'],
+                    models=models
+                )
+            finally:
+                # every pool thread has its own connection, don't leave it open
+                connection.close()
+
+            return num_posts, qa_calls_saved, time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+
+        total_posts = 0
+        skipped_forums = 0
+        failed_forums = 0
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            jobs = {executor.submit(run, forum_obj): forum_obj for forum_obj in forums}
+
+            for job in as_completed(jobs):
+                forum_obj = jobs[job]
+
+                try:
+                    num_posts, qa_calls_saved, seconds = job.result()
+                except (InferenceInProgress, InferencesExist) as error:
+                    # a request made inferences for the forum alongside the command
+                    skipped_forums += 1
+
+                    self.stdout.write(f'{forum_obj.id}: skipped ({error})')
+
+                    continue
+                except Exception as error:
+                    failed_forums += 1
+
+                    self.stderr.write(f'{forum_obj.id}: failed ({error})')
+
+                    continue
+
+                total_posts += num_posts
+
+                self.stdout.write(
+                    f'{forum_obj.id}: {num_posts} posts in {seconds:.1f}s '
+                    f'({num_posts / max(seconds, 1e-9):.2f} posts/s, {qa_calls_saved} QA calls saved)'
+                )
+
+        total_seconds = time.perf_counter() - start_time
+
+        self.stdout.write(
+            f'{len(forums) - skipped_forums - failed_forums}/{len(forums)} forums '
+            f'({skipped_forums} skipped), {total_posts} posts in '
+            f'{total_seconds:.1f}s ({total_posts / max(total_seconds, 1e-9):.2f} posts/s)'
+        )
+
+        if failed_forums:
+            raise CommandError(f'{failed_forums} forums failed, rerun to retry them')
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-19 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foruminferences', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foruminferences',
+            name='clusters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
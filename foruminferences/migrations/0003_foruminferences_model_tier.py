@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-19 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foruminferences', '0002_foruminferences_clusters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foruminferences',
+            name='model_tier',
+            field=models.CharField(default='accurate', max_length=32),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.0.4 on 2026-10-19 03:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def delete_duplicate_inferences(apps, schema_editor):
+    # overlapping jobs could save more than one row for a forum, all pointing
+    # at the same inference file, so only the newest row is kept
+    ForumInferences = apps.get_model('foruminferences', 'ForumInferences')
+
+    seen_forums = set()
+
+    for forum_inferences in ForumInferences.objects.order_by('forum_id', '-date_created'):
+        if forum_inferences.forum_id in seen_forums:
+            forum_inferences.delete()
+        else:
+            seen_forums.add(forum_inferences.forum_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0001_initial'),
+        ('foruminferences', '0003_foruminferences_model_tier'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_inferences, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='foruminferences',
+            name='forum',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='forums.forums'),
+        ),
+    ]
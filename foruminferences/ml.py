@@ -0,0 +1,67 @@
+import threading
+
+from inferencebackend.settings import DEFAULT_MODEL_TIER, MODEL_TIERS, STUB_MODELS
+
+# torch, transformers and sentence_transformers are only imported by the
+# functions below, so workers that never make inferences don't load them
+
+_models = {}
+_models_lock = threading.Lock()
+
+def sentence_util():
+    '''
+    sentence_transformers.util, imported on first use
+    '''
+
+    if STUB_MODELS:
+        from foruminferences import stub_models
+
+        return stub_models
+
+    from sentence_transformers import util
+
+    return util
+
+def load_models(model_tier=DEFAULT_MODEL_TIER):
+    '''
+    Load the question answering and sentence embedding models of a tier.
+    Models are loaded once per process and shared by every inference.
+
+    Args:
+        model_tier: key of MODEL_TIERS
+
+    Returns:
+        Tuple of (qa_model, sent_model)
+    '''
+
+    if STUB_MODELS:
+        from foruminferences.stub_models import StubQuestionAnswering, StubSentenceTransformer
+
+        return StubQuestionAnswering(), StubSentenceTransformer()
+
+    with _models_lock:
+        if model_tier not in _models:
+            from transformers import pipeline
+            from sentence_transformers import SentenceTransformer
+
+            model_names = MODEL_TIERS[model_tier]
+
+            qa_model = pipeline(
+                'question-answering', 
+                model=model_names['qa_model'], 
+                tokenizer=model_names['qa_model']
+            )
+
+            sent_model = SentenceTransformer(model_names['sent_model'])
+
+            _models[model_tier] = (qa_model, sent_model)
+
+    return _models[model_tier]
+
+def start_warm_up():
+    '''
+    Import the ML stack and load the default tier's models on a background
+    thread, so the first inference doesn't pay for it
+    '''
+
+    threading.Thread(target=load_models, name='model-warm-up', daemon=True).start()
@@ -4,18 +4,23 @@ from django.db import models
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 
-from inferencebackend.settings import INFERENCES_FILE_LOCATION
+from inferencebackend.settings import DEFAULT_MODEL_TIER, INFERENCES_FILE_LOCATION
 
 from forums.models import Forums
 
+from foruminferences.artifacts import inference_file_name, remove_inference_progress
+
 class ForumInferences(models.Model):
     '''
     Forum Inferences model. Stores forum answer inferences.
 
     Fields
         - id
-        - forum*
+        - forum* -> one ForumInferences per forum
         - infereces*
+        - model_tier -> MODEL_TIERS key of the models that made the inferences
+        - clusters -> cached post clusters keyed by question, similarity and method
+          (at most CLUSTER_CACHE_SIZE)
         - data_created
     '''
 
@@ -27,10 +32,14 @@ class ForumInferences(models.Model):
         editable=False
     )
 
-    forum = models.ForeignKey(Forums, on_delete=models.CASCADE)
+    forum = models.OneToOneField(Forums, on_delete=models.CASCADE)
 
     inferences = models.FileField(blank=False, upload_to=INFERENCES_FILE_LOCATION)
 
+    model_tier = models.CharField(max_length=32, default=DEFAULT_MODEL_TIER)
+
+    clusters = models.JSONField(blank=True, default=dict)
+
     date_created = models.DateTimeField(auto_now_add=True, editable=False)
 
     def __str__(self):
@@ -39,7 +48,18 @@ class ForumInferences(models.Model):
 @receiver(pre_delete, sender=ForumInferences)
 def pre_delete_forums_inference(sender, instance, **kwargs):
     '''
-    Delete inference JSON file when forums inference object is deleted
+    Delete inference JSON file (and any leftover job progress) when forums
+    inference object is deleted
     '''
 
     instance.inferences.storage.delete(instance.inferences.name)
+
+    remove_inference_progress(instance.inferences.name)
+
+@receiver(pre_delete, sender=Forums)
+def pre_delete_forums_inference_progress(sender, instance, **kwargs):
+    '''
+    Delete the progress of an unfinished inference job when its forum is deleted
+    '''
+
+    remove_inference_progress(inference_file_name(instance))
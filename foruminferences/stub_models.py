@@ -0,0 +1,61 @@
+import hashlib
+import re
+
+import numpy as np
+
+# same size as the accurate tier's sentence embeddings, so payloads stay realistic
+EMBEDDING_SIZE = 768
+
+class StubQuestionAnswering:
+    '''
+    Stands in for the question answering pipeline: answers with the first
+    sentence of the context
+    '''
+
+    def __call__(self, qa_input, **kwargs):
+        context = qa_input['context']
+
+        sentence_end = re.search(r'[.!?](\s|$)', context)
+        end_ind = sentence_end.start() + 1 if sentence_end else len(context)
+
+        return {
+            'answer': context[:end_ind],
+            'start': 0,
+            'end': end_ind,
+            'score': 1.0
+        }
+
+class StubSentenceTransformer:
+    '''
+    Stands in for SentenceTransformer: embeds text as a normalized bag of
+    hashed words, so similar texts still get similar embeddings
+    '''
+
+    def encode(self, sentences, **kwargs):
+        if isinstance(sentences, str):
+            return self.encode([sentences])[0]
+
+        embeddings = np.zeros((len(sentences), EMBEDDING_SIZE), dtype=np.float32)
+
+        for sentence_ind, sentence in enumerate(sentences):
+            for word in re.findall(r'\w+', sentence.lower()):
+                word_hash = int.from_bytes(hashlib.md5(word.encode()).digest()[:4], 'little')
+
+                embeddings[sentence_ind, word_hash % EMBEDDING_SIZE] += 1
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+        return embeddings / np.maximum(norms, 1e-12)
+
+def pytorch_cos_sim(vec1, vec2):
+    '''
+    numpy version of sentence_transformers.util.pytorch_cos_sim
+    '''
+
+    vec1 = np.atleast_2d(np.asarray(vec1, dtype=np.float32))
+    vec2 = np.atleast_2d(np.asarray(vec2, dtype=np.float32))
+
+    vec1 = vec1 / np.maximum(np.linalg.norm(vec1, axis=1, keepdims=True), 1e-12)
+    vec2 = vec2 / np.maximum(np.linalg.norm(vec2, axis=1, keepdims=True), 1e-12)
+
+    return vec1 @ vec2.T
@@ -0,0 +1,86 @@
+import os
+import tempfile
+
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase, override_settings
+
+from forums.models import Forums
+
+from foruminferences import artifacts, ml, views
+
+def answer(text, embedding=None, skipped=False):
+    '''
+    Inference for one question on one post, as stored in inference files
+    '''
+
+    inference = {
+        'answer': text,
+        'start_ind': 0,
+        'end_ind': len(text),
+        'answer_embedding': embedding
+    }
+
+    if skipped:
+        inference['skipped'] = True
+
+    return inference
+
+class ForumTestCase(TransactionTestCase):
+    '''
+    Base for tests that make inferences. Forum CSVs and inference files go to
+    a temporary directory and the stub models stand in for the real ones.
+
+    Inference jobs run on other threads, so each test commits to the database
+    instead of running in a transaction.
+    '''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.inferences_location = os.path.join(directory.name, 'inferences') + '/'
+        os.mkdir(self.inferences_location)
+
+        media_root = override_settings(MEDIA_ROOT=directory.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        for patcher in (
+            mock.patch.object(artifacts, 'INFERENCES_FILE_LOCATION', self.inferences_location),
+            mock.patch.object(views, 'INFERENCES_FILE_LOCATION', self.inferences_location),
+            mock.patch.object(ml, 'STUB_MODELS', True)
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def create_forum(self, messages, name='forum'):
+        '''
+        Create a forum with one top level post per message, numbered from 1
+
+        Returns:
+            Forum id
+        '''
+
+        rows = ''.join(
+            f'{post_id},0,{post_id},User {post_id},"{message}"\n'
+            for post_id, message in enumerate(messages, start=1)
+        )
+
+        csv_file = SimpleUploadedFile(
+            f'{name}.csv',
+            ('id,parent,userid,userfullname,message\n' + rows).encode()
+        )
+
+        return Forums.objects.create(csv_file=csv_file).pk
+
+    def forum(self, forum_id):
+        '''
+        Load a forum, as every request and job does, so its CSV is read from the start
+        '''
+
+        return Forums.objects.get(id=forum_id)
+
+    def inference_location(self, forum_id):
+        return self.inferences_location + artifacts.inference_file_name(self.forum(forum_id))
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+
+from unittest import mock
+
+from django.test import AsyncRequestFactory, Client
+
+from inferencebackend.concurrency import AdmissionController
+
+from foruminferences import views
+from foruminferences.models import ForumInferences
+from foruminferences.tests import ForumTestCase
+
+class InferenceAdmissionTestCase(ForumTestCase):
+    '''
+    Tests for turning inference requests away when the server is busy, and
+    for giving capacity back only when a job ends
+    '''
+
+    def setUp(self):
+        super().setUp()
+
+        self.admission = AdmissionController(capacity=4, max_waiting=0, retry_after=7)
+
+        patcher = mock.patch.object(views, 'inference_admission', self.admission)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.forum_id = self.create_forum(['I like cats.', 'Cats purr.'])
+
+    def fill(self):
+        asyncio.run(self.admission.acquire(4))
+
+    def post(self, path, data):
+        return Client().post(path, json.dumps({'forum_id': str(self.forum_id), **data}), content_type='application/json')
+
+    def test_question_inference_rejected(self):
+        self.fill()
+
+        response = self.post('/questioninference/', {'question': 'cats?', 'post_ids': ['1']})
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+
+    def test_forum_inference_rejected(self):
+        self.fill()
+
+        request_data = {'questions': ['cats?']}
+
+        response = self.post('/foruminference/', request_data)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+
+        # the forum's lock was given back, so the request can be retried
+        self.admission.release(4)
+
+        response = self.post('/foruminference/', request_data)
+
+        self.assertEqual(response.status_code, 200)
+
+        b''.join(response.streaming_content)
+
+        self.assertTrue(ForumInferences.objects.filter(forum_id=self.forum_id).exists())
+        self.assertEqual(self.admission.in_use, 0)
+
+    def test_capacity_held_until_job_ends(self):
+        job_started = threading.Event()
+        finish_job = threading.Event()
+
+        def infer_posts(posts, question, model_tier):
+            job_started.set()
+            finish_job.wait(timeout=5)
+
+            return {}
+
+        request = AsyncRequestFactory().post(
+            '/questioninference/',
+            {'forum_id': str(self.forum_id), 'question': 'cats?', 'post_ids': ['1']},
+            content_type='application/json'
+        )
+
+        async def cancel_request():
+            view = asyncio.create_task(views.QuestionInferenceView.as_view()(request))
+
+            await asyncio.get_running_loop().run_in_executor(None, job_started.wait, 5)
+
+            # the client goes away while its job is still running
+            view.cancel()
+
+            await asyncio.gather(view, return_exceptions=True)
+
+        with mock.patch.object(views, 'infer_posts', infer_posts):
+            asyncio.run(cancel_request())
+
+            self.assertGreater(self.admission.in_use, 0)
+
+            finish_job.set()
+
+            self.assertTrue(asyncio.run(self.admission_released()))
+
+    async def admission_released(self):
+        for _ in range(100):
+            if not self.admission.in_use:
+                return True
+
+            await asyncio.sleep(0.05)
+
+        return False
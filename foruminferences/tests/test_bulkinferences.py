@@ -0,0 +1,105 @@
+import json
+import os
+
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import Client
+
+from inferencebackend import concurrency
+
+from foruminferences.artifacts import InferenceLock, inference_file_name, slice_inferences
+from foruminferences.models import ForumInferences
+from foruminferences.tests import ForumTestCase
+
+class BulkInferencesTestCase(ForumTestCase):
+    '''
+    Tests for the bulkinferences management command
+    '''
+
+    def setUp(self):
+        super().setUp()
+
+        self.questions_file = os.path.join(self.inferences_location, 'questions.txt')
+
+        with open(self.questions_file, 'w') as questions_file:
+            questions_file.write('Who?\nWhere?\n')
+
+        self.forum_ids = [
+            self.create_forum([f'Post {post_id} of forum {forum_ind}.' for post_id in range(1, 4)], f'forum{forum_ind}')
+            for forum_ind in range(3)
+        ]
+
+    def bulk_inferences(self, *args):
+        stdout = StringIO()
+
+        call_command('bulkinferences', self.questions_file, '--workers', '2', *args, stdout=stdout)
+
+        return stdout.getvalue()
+
+    def test_every_forum(self):
+        output = self.bulk_inferences()
+
+        self.assertIn('3/3 forums (0 skipped), 9 posts', output)
+
+        for forum_id in self.forum_ids:
+            forum_inferences = ForumInferences.objects.get(forum_id=forum_id)
+            inferences = slice_inferences(self.inference_location(forum_id))
+
+            self.assertEqual(forum_inferences.model_tier, 'accurate')
+            self.assertEqual(inferences['questions'], ['Who?', 'Where?'])
+            self.assertEqual(list(inferences['inferences']), ['1', '2', '3'])
+
+        self.assertIn('No forums need inferences', self.bulk_inferences())
+
+    def test_forum_ids(self):
+        output = self.bulk_inferences('--forum-ids', str(self.forum_ids[1]), '--model-tier', 'fast')
+
+        self.assertIn('1/1 forums', output)
+
+        forum_inferences = ForumInferences.objects.get()
+
+        self.assertEqual(forum_inferences.forum_id, self.forum_ids[1])
+        self.assertEqual(forum_inferences.model_tier, 'fast')
+
+    def test_invalid_forum_ids(self):
+        with self.assertRaisesMessage(CommandError, 'Invalid forum id: 12'):
+            self.bulk_inferences('--forum-ids', str(self.forum_ids[0]), '12')
+
+        self.assertFalse(ForumInferences.objects.exists())
+
+    def test_skips_forums_with_a_running_job(self):
+        with InferenceLock(inference_file_name(self.forum(self.forum_ids[0]))):
+            output = self.bulk_inferences()
+
+        self.assertIn(f'{self.forum_ids[0]}: skipped', output)
+        self.assertIn('2/3 forums (1 skipped)', output)
+        self.assertEqual(ForumInferences.objects.count(), 2)
+
+    def test_closes_connections(self):
+        with mock.patch('foruminferences.management.commands.bulkinferences.connection') as connection:
+            self.bulk_inferences()
+
+        self.assertEqual(connection.close.call_count, 3)
+
+class InferenceJobConnectionsTestCase(ForumTestCase):
+    '''
+    Tests that inference jobs on the inference executor don't keep stale
+    database connections
+    '''
+
+    def test_request_job_closes_connections(self):
+        forum_id = self.create_forum(['Post 1.'])
+
+        with mock.patch.object(concurrency, 'close_old_connections') as close_old_connections:
+            response = Client().post(
+                '/foruminference/',
+                json.dumps({'forum_id': str(forum_id), 'questions': ['Who?']}),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+
+        # before and after the job
+        self.assertEqual(close_old_connections.call_count, 2)
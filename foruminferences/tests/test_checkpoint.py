@@ -0,0 +1,270 @@
+import json
+import os
+import tempfile
+
+from unittest import mock
+
+from django.test import Client, SimpleTestCase
+
+from foruminferences import artifacts, views
+from foruminferences.artifacts import (
+    InferenceCheckpoint,
+    InferenceInProgress,
+    InferenceLock,
+    InferencesExist,
+    inference_file_name,
+    remove_inference_progress,
+    slice_inferences
+)
+from foruminferences.models import ForumInferences
+from foruminferences.tests import ForumTestCase, answer
+
+class InferenceCheckpointTestCase(SimpleTestCase):
+    '''
+    Tests for recording and resuming inference jobs
+    '''
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+        patcher = mock.patch.object(artifacts, 'INFERENCES_FILE_LOCATION', self.directory.name + '/')
+        patcher.start()
+
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def checkpoint(self, questions=('Who?',), options=None):
+        checkpoint = InferenceCheckpoint('forum_inferences.json', list(questions), options=options, interval=2)
+
+        self.addCleanup(checkpoint.remove)
+
+        return checkpoint
+
+    def test_new_checkpoint_is_empty(self):
+        checkpoint = self.checkpoint()
+
+        self.assertEqual(checkpoint.load(), set())
+        self.assertEqual(list(checkpoint.iter_records()), [])
+
+    def test_resume(self):
+        checkpoint = self.checkpoint(options={'model_tier': 'fast'})
+
+        checkpoint.append('1', [answer('a')])
+        checkpoint.append('2', [answer('b')])
+        checkpoint.flush()
+
+        resumed = self.checkpoint(options={'model_tier': 'fast'})
+
+        self.assertEqual(resumed.load(), {'1', '2'})
+
+        resumed.append('3', [answer('c')])
+
+        self.assertEqual(
+            list(resumed.iter_records()),
+            [('1', [answer('a')]), ('2', [answer('b')]), ('3', [answer('c')])]
+        )
+
+    def test_cut_off_line_is_truncated(self):
+        checkpoint = self.checkpoint()
+
+        checkpoint.append('1', [answer('a')])
+        checkpoint.append('2', [answer('b')])
+        checkpoint.flush() # the job dies mid write
+
+        with open(checkpoint.location, 'a') as checkpoint_file:
+            checkpoint_file.write('{"post_id": "3", "answ')
+
+        resumed = self.checkpoint()
+
+        self.assertEqual(resumed.load(), {'1', '2'})
+
+        with open(resumed.location) as checkpoint_file:
+            self.assertTrue(checkpoint_file.read().endswith('\n'))
+
+        resumed.append('3', [answer('c')])
+
+        self.assertEqual([post_id for post_id, _ in resumed.iter_records()], ['1', '2', '3'])
+
+    def test_other_options_start_over(self):
+        checkpoint = self.checkpoint(options={'model_tier': 'fast'})
+
+        checkpoint.append('1', [answer('a')])
+        checkpoint.flush()
+
+        for other in (self.checkpoint(options={'model_tier': 'accurate'}), self.checkpoint(['Where?'])):
+            self.assertEqual(other.load(), set())
+            self.assertFalse(os.path.exists(other.location))
+
+    def test_cut_off_header_starts_over(self):
+        checkpoint = self.checkpoint()
+
+        with open(checkpoint.location, 'w') as checkpoint_file:
+            checkpoint_file.write('{"questions": ["Who?"], "opt')
+
+        self.assertEqual(checkpoint.load(), set())
+
+        checkpoint.append('1', [answer('a')])
+
+        self.assertEqual(list(checkpoint.iter_records()), [('1', [answer('a')])])
+
+    def test_remove(self):
+        checkpoint = self.checkpoint()
+
+        checkpoint.append('1', [answer('a')])
+        checkpoint.remove()
+
+        self.assertFalse(os.path.exists(checkpoint.location))
+
+    def test_remove_inference_progress(self):
+        checkpoint = self.checkpoint()
+
+        checkpoint.append('1', [answer('a')])
+        checkpoint.flush()
+
+        temp_location = os.path.join(self.directory.name, 'forum_inferences.json.tmp')
+
+        with open(temp_location, 'w') as temp_file:
+            temp_file.write('{')
+
+        remove_inference_progress('forum_inferences.json')
+
+        self.assertFalse(os.path.exists(checkpoint.location))
+        self.assertFalse(os.path.exists(temp_location))
+
+    def test_lock_is_exclusive(self):
+        lock = InferenceLock('forum_inferences.json')
+
+        with lock:
+            with self.assertRaises(InferenceInProgress):
+                InferenceLock('forum_inferences.json').acquire()
+
+        self.assertFalse(os.path.exists(lock.location))
+
+        with InferenceLock('forum_inferences.json'):
+            pass
+
+class ResumeInferencesTestCase(ForumTestCase):
+    '''
+    Tests for interrupted inference jobs and overlapping requests
+    '''
+
+    messages = [f'Post {post_id} about cats.' for post_id in range(1, 7)]
+
+    def fail_on_call(self, failing_call):
+        '''
+        Patch the QA step to raise on its failing_call-th call, counting calls
+        '''
+
+        make_inferences = views.make_inferences
+        self.calls = 0
+
+        def counted_make_inferences(*args):
+            self.calls += 1
+
+            if self.calls == failing_call:
+                raise RuntimeError('QA model failed')
+
+            return make_inferences(*args)
+
+        patcher = mock.patch.object(views, 'make_inferences', counted_make_inferences)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_resume_interrupted_job(self):
+        forum_id = self.create_forum(self.messages)
+
+        self.fail_on_call(4)
+
+        # the error is kept with its traceback, as a caller still handling it would
+        try:
+            views.create_forum_inferences(self.forum(forum_id), ['What pet?'])
+        except RuntimeError as error:
+            failure = error
+
+        self.assertIsInstance(failure, RuntimeError)
+        self.assertFalse(ForumInferences.objects.filter(forum_id=forum_id).exists())
+
+        # finished posts are on disk and the lock is free as soon as the job fails
+        checkpoint = InferenceCheckpoint(
+            inference_file_name(self.forum(forum_id)),
+            ['What pet?'],
+            options={'model_tier': 'accurate'}
+        )
+
+        self.assertEqual(checkpoint.load(), {'1', '2', '3'})
+
+        with InferenceLock(inference_file_name(self.forum(forum_id))):
+            pass
+
+        forum_inferences, num_posts, _ = views.create_forum_inferences(self.forum(forum_id), ['What pet?'])
+
+        # 4 calls of the failed job, then only the 3 unfinished posts
+        self.assertEqual(self.calls, 7)
+        self.assertEqual(num_posts, 6)
+        self.assertEqual(forum_inferences.forum_id, forum_id)
+
+        inferences = slice_inferences(self.inference_location(forum_id))['inferences']
+
+        self.assertEqual(list(inferences), ['1', '2', '3', '4', '5', '6'])
+        self.assertEqual(inferences['5'][0]['answer'], 'Post 5 about cats.')
+
+        self.assertFalse(os.path.exists(checkpoint.location))
+
+    def test_other_questions_start_over(self):
+        forum_id = self.create_forum(self.messages)
+
+        self.fail_on_call(4)
+
+        with self.assertRaises(RuntimeError):
+            views.create_forum_inferences(self.forum(forum_id), ['What pet?'])
+
+        views.create_forum_inferences(self.forum(forum_id), ['Who?'])
+
+        # 4 calls of the failed job, then all 6 posts again
+        self.assertEqual(self.calls, 10)
+
+    def test_job_for_forum_with_inferences(self):
+        forum_id = self.create_forum(self.messages)
+
+        views.create_forum_inferences(self.forum(forum_id), ['What pet?'])
+
+        with self.assertRaises(InferencesExist):
+            views.create_forum_inferences(self.forum(forum_id), ['What pet?'])
+
+    def test_request_while_job_runs(self):
+        forum_id = self.create_forum(self.messages)
+
+        request_data = json.dumps({'forum_id': str(forum_id), 'questions': ['What pet?']})
+
+        with InferenceLock(inference_file_name(self.forum(forum_id))):
+            response = Client().post('/foruminference/', request_data, content_type='application/json')
+
+            self.assertEqual(response.status_code, 409)
+
+            with self.assertRaises(InferenceInProgress):
+                views.create_forum_inferences(self.forum(forum_id), ['What pet?'])
+
+        self.assertFalse(ForumInferences.objects.filter(forum_id=forum_id).exists())
+
+        response = Client().post('/foruminference/', request_data, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ForumInferences.objects.filter(forum_id=forum_id).count(), 1)
+
+    def test_delete_removes_progress(self):
+        forum_id = self.create_forum(self.messages)
+
+        self.fail_on_call(4)
+
+        with self.assertRaises(RuntimeError):
+            views.create_forum_inferences(self.forum(forum_id), ['What pet?'])
+
+        checkpoint_location = self.inference_location(forum_id) + '.checkpoint'
+
+        self.assertTrue(os.path.exists(checkpoint_location))
+
+        self.forum(forum_id).delete()
+
+        self.assertFalse(os.path.exists(checkpoint_location))
@@ -0,0 +1,105 @@
+from unittest import mock
+
+import numpy as np
+
+from django.test import SimpleTestCase
+
+from foruminferences import clustering
+from foruminferences.clustering import (
+    cluster_posts,
+    connected_components,
+    greedy_centroid_clusters,
+    normalized_embedding_matrix
+)
+from foruminferences.tests import answer
+
+class ClusteringTestCase(SimpleTestCase):
+    '''
+    Tests for grouping posts by answer similarity
+    '''
+
+    def unit_rows(self, *angles):
+        return np.array([[np.cos(angle), np.sin(angle)] for angle in angles], dtype=np.float32)
+
+    def sorted_clusters(self, clusters):
+        return sorted(sorted(cluster) for cluster in clusters)
+
+    def test_normalized_embedding_matrix(self):
+        inferences_dict = {
+            '1': [answer('a', [3.0, 4.0])],
+            '2': [answer('b', [0.0, 0.0])]
+        }
+
+        post_ids, embeddings = normalized_embedding_matrix(inferences_dict, 0)
+
+        self.assertEqual(post_ids, ['1', '2'])
+        np.testing.assert_allclose(embeddings, [[0.6, 0.8], [0.0, 0.0]])
+
+    def test_connected_components_are_transitive(self):
+        # 0 and 1, 1 and 2 are close, 0 and 2 are not, 3 is far from all
+        embeddings = self.unit_rows(0, 0.5, 1.0, 3.0)
+
+        self.assertEqual(
+            self.sorted_clusters(connected_components(embeddings, np.cos(0.6))),
+            [[0, 1, 2], [3]]
+        )
+
+    def test_connected_components_across_blocks(self):
+        embeddings = self.unit_rows(0, 3.0, 0.5, 3.1, 1.0)
+
+        with mock.patch.object(clustering, 'BLOCK_SIZE', 2):
+            clusters = connected_components(embeddings, np.cos(0.6))
+
+        self.assertEqual(self.sorted_clusters(clusters), [[0, 2, 4], [1, 3]])
+
+    def test_connected_components_match_pairwise_search(self):
+        embeddings = np.random.default_rng(0).normal(size=(200, 8)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+        similar = embeddings @ embeddings.T > 0.6
+
+        with mock.patch.object(clustering, 'BLOCK_SIZE', 32):
+            clusters = connected_components(embeddings, 0.6)
+
+        labels = np.empty(len(embeddings), dtype=int)
+
+        for label, cluster in enumerate(clusters):
+            labels[cluster] = label
+
+        # no similar pair is split, and every cluster is connected by similar pairs
+        self.assertTrue(np.all(labels[:, None] == labels[None, :], where=similar))
+
+        for cluster in clusters:
+            reached = {cluster[0]}
+            frontier = [cluster[0]]
+
+            while frontier:
+                row = frontier.pop()
+
+                for other in np.nonzero(similar[row])[0].tolist():
+                    if other not in reached:
+                        reached.add(other)
+                        frontier.append(other)
+
+            self.assertEqual(reached, set(cluster))
+
+    def test_greedy_centroid_clusters_do_not_chain(self):
+        embeddings = self.unit_rows(0, 0.5, 1.0, 3.0)
+
+        self.assertEqual(
+            greedy_centroid_clusters(embeddings, np.cos(0.6)),
+            [[0, 1], [2], [3]]
+        )
+
+    def test_cluster_posts(self):
+        inferences_dict = {
+            '1': [answer('a', [1.0, 0.0])],
+            '2': [answer('b', [0.0, 1.0])],
+            '3': [answer('c', [1.0, 0.01])]
+        }
+
+        for method in clustering.CLUSTER_METHODS:
+            self.assertEqual(cluster_posts(inferences_dict, 0, 0.9, method), [['1', '3'], ['2']])
+
+    def test_cluster_posts_without_posts(self):
+        self.assertEqual(cluster_posts({}, 0, 0.9), [])
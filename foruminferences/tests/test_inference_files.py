@@ -0,0 +1,156 @@
+import json
+import os
+import tempfile
+
+from django.test import Client, SimpleTestCase
+
+from foruminferences.artifacts import (
+    QuestionNotInferred,
+    iter_inferences_json,
+    open_inferences,
+    slice_inferences,
+    write_inferences_atomic
+)
+from foruminferences.tests import ForumTestCase, answer
+
+class InferencesFileTestCase(SimpleTestCase):
+    '''
+    Tests for writing and reading inference files one post at a time
+    '''
+
+    questions = ['Who?', 'Where?']
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, 'forum_inferences.json')
+
+        self.inferences = {
+            str(post_id): [
+                answer(f'who {post_id}', [post_id, 1.0]),
+                answer(f'where {post_id}', [1.0, post_id])
+            ]
+            for post_id in range(1, 6)
+        }
+
+        write_inferences_atomic(self.location, self.questions, iter(self.inferences.items()))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_written_file_is_json(self):
+        with open(self.location) as inference_file:
+            self.assertEqual(
+                json.load(inference_file),
+                {'questions': self.questions, 'inferences': self.inferences}
+            )
+
+        self.assertFalse(os.path.exists(f'{self.location}.tmp'))
+
+    def test_open_inferences(self):
+        with open_inferences(self.location) as (questions, posts):
+            self.assertEqual(questions, self.questions)
+            self.assertEqual(dict(posts), self.inferences)
+
+    def test_open_single_line_inferences(self):
+        with open(self.location, 'w') as inference_file:
+            json.dump({'questions': self.questions, 'inferences': self.inferences}, inference_file)
+
+        with open_inferences(self.location) as (questions, posts):
+            self.assertEqual(questions, self.questions)
+            self.assertEqual(dict(posts), self.inferences)
+
+    def test_empty_inferences(self):
+        write_inferences_atomic(self.location, self.questions, [])
+
+        with open_inferences(self.location) as (questions, posts):
+            self.assertEqual(questions, self.questions)
+            self.assertEqual(list(posts), [])
+
+    def test_iter_inferences_json(self):
+        inferences = json.loads(''.join(iter_inferences_json(self.location, qa_calls_saved=3)))
+
+        self.assertEqual(
+            inferences,
+            {'questions': self.questions, 'inferences': self.inferences, 'qa_calls_saved': 3}
+        )
+
+    def test_slice_questions(self):
+        sliced_inferences = slice_inferences(self.location, questions=['Where?'])
+
+        self.assertEqual(sliced_inferences['questions'], ['Where?'])
+        self.assertEqual(sliced_inferences['inferences']['2'], [self.inferences['2'][1]])
+        self.assertNotIn('page', sliced_inferences)
+
+    def test_slice_question_not_inferred(self):
+        with self.assertRaises(QuestionNotInferred):
+            slice_inferences(self.location, questions=['When?'])
+
+    def test_slice_post_id_range(self):
+        sliced_inferences = slice_inferences(self.location, post_id_start=2, post_id_end=4)
+
+        self.assertEqual(list(sliced_inferences['inferences']), ['2', '3', '4'])
+
+    def test_slice_pages(self):
+        first_page = slice_inferences(self.location, page=1, page_size=2)
+        last_page = slice_inferences(self.location, page=3, page_size=2)
+
+        self.assertEqual(list(first_page['inferences']), ['1', '2'])
+        self.assertEqual(first_page['page'], {'number': 1, 'size': 2, 'has_more': True})
+
+        self.assertEqual(list(last_page['inferences']), ['5'])
+        self.assertFalse(last_page['page']['has_more'])
+
+    def test_slice_pages_after_post_id_range(self):
+        sliced_inferences = slice_inferences(self.location, post_id_start=3, page=2, page_size=2)
+
+        self.assertEqual(list(sliced_inferences['inferences']), ['5'])
+
+    def test_slice_without_embeddings(self):
+        sliced_inferences = slice_inferences(self.location, include_embeddings=False)
+
+        for answers in sliced_inferences['inferences'].values():
+            for inference in answers:
+                self.assertNotIn('answer_embedding', inference)
+                self.assertIn('answer', inference)
+
+class InferencesQueryTestCase(ForumTestCase):
+    '''
+    Tests for reading part of a forum's inferences through GET /foruminference/
+    '''
+
+    def setUp(self):
+        super().setUp()
+
+        self.forum_id = self.create_forum([f'Post {post_id}.' for post_id in range(1, 6)])
+
+        response = Client().post(
+            '/foruminference/',
+            json.dumps({'forum_id': str(self.forum_id), 'questions': ['Who?', 'Where?']}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+        # the made inferences are streamed back from the inference file
+        self.inferences = json.loads(b''.join(response.streaming_content))['data']
+
+    def get(self, **params):
+        return Client().get('/foruminference/', {'forum_id': str(self.forum_id), **params})
+
+    def test_all_inferences(self):
+        data = self.get().json()['data']
+
+        self.assertEqual(data['questions'], ['Who?', 'Where?'])
+        self.assertEqual(data['inferences'], self.inferences['inferences'])
+
+    def test_slice(self):
+        data = self.get(question='Where?', page=2, page_size=2, include_embeddings='false').json()['data']
+
+        self.assertEqual(data['questions'], ['Where?'])
+        self.assertEqual(list(data['inferences']), ['3', '4'])
+        self.assertEqual(data['inferences']['3'][0]['answer'], 'Post 3.')
+        self.assertNotIn('answer_embedding', data['inferences']['3'][0])
+        self.assertEqual(data['page'], {'number': 2, 'size': 2, 'has_more': True})
+
+    def test_question_not_inferred(self):
+        self.assertEqual(self.get(question='When?').status_code, 404)
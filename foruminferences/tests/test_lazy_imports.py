@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from unittest import mock
+
+import numpy as np
+
+from django.conf import settings
+from django.test import Client, SimpleTestCase
+
+from inferencebackend import asgi
+
+from foruminferences import ml, stub_models, views
+from foruminferences.tests import ForumTestCase
+
+class LazyImportTestCase(SimpleTestCase):
+    '''
+    Tests that the ML stack is only imported when an inference needs it
+    '''
+
+    def test_urls_dont_import_ml_stack(self):
+        script = (
+            'import sys, django; django.setup(); import inferencebackend.urls; '
+            'print(sorted({"torch", "transformers", "sentence_transformers"} & set(sys.modules)))'
+        )
+
+        result = subprocess.run(
+            [sys.executable, '-c', script],
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'inferencebackend.settings'},
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+
+        self.assertEqual(result.stdout.strip(), '[]')
+
+    def test_cosine_similarity(self):
+        vec1, vec2 = [1.0, 2.0, 3.0], [3.0, -1.0, 0.5]
+
+        self.assertAlmostEqual(
+            views.cosine_similarity(vec1, vec2),
+            float(stub_models.pytorch_cos_sim(vec1, vec2)[0][0]),
+            places=6
+        )
+        self.assertAlmostEqual(views.cosine_similarity(vec1, vec1), 1.0, places=6)
+        self.assertEqual(views.cosine_similarity(vec1, np.zeros(3)), 0.0)
+
+class WarmUpTestCase(SimpleTestCase):
+    '''
+    Tests for preloading the models once the server is accepting requests
+    '''
+
+    def test_start_warm_up(self):
+        loaded = threading.Event()
+
+        with mock.patch.object(ml, 'load_models', side_effect=lambda: loaded.set()):
+            ml.start_warm_up()
+
+            self.assertTrue(loaded.wait(timeout=5))
+
+    def lifespan(self):
+        messages = asyncio.Queue()
+        sent = []
+
+        async def send(message):
+            sent.append(message['type'])
+
+        async def run():
+            for message_type in ('lifespan.startup', 'lifespan.shutdown'):
+                messages.put_nowait({'type': message_type})
+
+            await asgi.application({'type': 'lifespan'}, messages.get, send)
+
+        asyncio.run(run())
+
+        return sent
+
+    def test_lifespan_warm_up(self):
+        with mock.patch.object(asgi, 'WARM_UP_MODELS', True), mock.patch.object(asgi, 'start_warm_up') as start_warm_up:
+            sent = self.lifespan()
+
+        start_warm_up.assert_called_once_with()
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+    def test_lifespan_without_warm_up(self):
+        with mock.patch.object(asgi, 'WARM_UP_MODELS', False), mock.patch.object(asgi, 'start_warm_up') as start_warm_up:
+            self.lifespan()
+
+        start_warm_up.assert_not_called()
+
+class RelationsWithoutModelsTestCase(ForumTestCase):
+    '''
+    Tests that reading inferences never loads the models
+    '''
+
+    def test_post_relations(self):
+        forum_id = self.create_forum(['I like cats.', 'Cats purr.', 'Fish swim.'])
+
+        views.create_forum_inferences(self.forum(forum_id), ['cats?'])
+
+        not_loaded = AssertionError('The ML stack was loaded')
+
+        with mock.patch.object(views, 'load_models', side_effect=not_loaded), \
+                mock.patch.object(views, 'sentence_util', side_effect=not_loaded):
+            response = Client().post(
+                '/postrelations/',
+                json.dumps({'forum_id': str(forum_id), 'post_id': 1, 'question': 'cats?', 'similarity': -1}),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json()['data']), ['1', '2', '3'])
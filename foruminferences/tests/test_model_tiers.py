@@ -0,0 +1,84 @@
+import json
+
+from unittest import mock
+
+from django.test import Client
+
+from foruminferences import ml, views
+from foruminferences.models import ForumInferences
+from foruminferences.tests import ForumTestCase
+
+class ModelTiersTestCase(ForumTestCase):
+    '''
+    Tests for choosing a model tier per request
+    '''
+
+    def setUp(self):
+        super().setUp()
+
+        self.client = Client()
+        self.forum_id = self.create_forum(['I like cats.', 'Cats purr.', 'Fish swim.'])
+
+        patcher = mock.patch.object(views, 'load_models', wraps=ml.load_models)
+        self.load_models = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, path, data):
+        return self.client.post(path, json.dumps({'forum_id': str(self.forum_id), **data}), content_type='application/json')
+
+    def make_inferences(self, model_tier):
+        response = self.post('/foruminference/', {'questions': ['cats?'], 'model_tier': model_tier})
+
+        self.assertEqual(response.status_code, 200)
+
+        b''.join(response.streaming_content)
+
+    def test_inferences_record_tier(self):
+        self.make_inferences('fast')
+
+        self.load_models.assert_called_once_with('fast')
+        self.assertEqual(ForumInferences.objects.get(forum_id=self.forum_id).model_tier, 'fast')
+
+        response = self.client.get('/foruminference/', {'forum_id': str(self.forum_id)})
+
+        self.assertEqual(response.json()['data']['model_tier'], 'fast')
+
+    def test_default_tier(self):
+        self.make_inferences('')
+
+        self.load_models.assert_called_once_with('accurate')
+        self.assertEqual(ForumInferences.objects.get(forum_id=self.forum_id).model_tier, 'accurate')
+
+    def test_unknown_tier(self):
+        response = self.post('/foruminference/', {'questions': ['cats?'], 'model_tier': 'huge'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ForumInferences.objects.exists())
+
+    def test_tier_mismatch(self):
+        self.make_inferences('fast')
+
+        requests = [
+            ('/postrelations/', {'question': 'cats?', 'post_id': 1, 'similarity': -1}),
+            ('/postclusters/', {'question': 'cats?', 'similarity': 0.5})
+        ]
+
+        for path, data in requests:
+            with self.subTest(path=path):
+                response = self.post(path, {**data, 'model_tier': 'accurate'})
+
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['message'], 'Inferences were made with a different model tier')
+
+                # the tier that made the inferences, or no tier at all, can be used
+                self.assertEqual(self.post(path, {**data, 'model_tier': 'fast'}).status_code, 200)
+                self.assertEqual(self.post(path, data).status_code, 200)
+
+    def test_question_inference_tier(self):
+        response = self.post('/questioninference/', {'question': 'cats?', 'post_ids': ['1', '2'], 'model_tier': 'fast'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['model_tier'], 'fast')
+        self.assertEqual(len(response.json()['data']['inferences']), 2)
+
+        self.load_models.assert_called_once_with('fast')
@@ -0,0 +1,109 @@
+import json
+
+from unittest import mock
+
+from django.test import Client, SimpleTestCase
+
+from foruminferences import ml, views
+from foruminferences.artifacts import slice_inferences
+from foruminferences.clustering import cluster_posts
+from foruminferences.stub_models import StubSentenceTransformer
+from foruminferences.tests import ForumTestCase, answer
+
+class RetrievePostsTestCase(SimpleTestCase):
+    '''
+    Tests for picking the posts worth running the QA model on
+    '''
+
+    messages = ['cats', 'dogs', 'cats cats dogs']
+
+    def setUp(self):
+        patcher = mock.patch.object(ml, 'STUB_MODELS', True)
+        patcher.start()
+
+        self.addCleanup(patcher.stop)
+
+    def retrieve(self, **kwargs):
+        return views.retrieve_posts(StubSentenceTransformer(), ['cats', 'dogs'], self.messages, **kwargs)
+
+    def test_top_k(self):
+        self.assertEqual(self.retrieve(top_k=2), [{0, 2}, {1, 2}])
+
+    def test_threshold(self):
+        self.assertEqual(self.retrieve(threshold=0.95), [{0}, {1}])
+
+    def test_threshold_and_top_k(self):
+        self.assertEqual(self.retrieve(threshold=0.5, top_k=1), [{0}, {1}])
+        self.assertEqual(self.retrieve(threshold=0.95, top_k=3), [{0}, {1}])
+
+class SkippedPostsTestCase(SimpleTestCase):
+    '''
+    Tests that posts skipped by retrieval are never compared with other answers
+    '''
+
+    inferences_dict = {
+        '1': [answer('cats', [1.0, 0.0])],
+        '2': [answer('cats too', [1.0, 0.01])],
+        '3': [answer('', None, skipped=True)],
+        '4': [answer('', None, skipped=True)]
+    }
+
+    def test_skipped_posts_are_not_related(self):
+        relations = views.find_post_relations(self.inferences_dict, 0, self.inferences_dict['1'][0], 0.5)
+
+        self.assertEqual(list(relations), ['1', '2'])
+
+    def test_skipped_base_post_has_no_relations(self):
+        self.assertEqual(views.find_post_relations(self.inferences_dict, 0, self.inferences_dict['3'][0], -1), {})
+
+    def test_skipped_posts_are_not_clustered(self):
+        self.assertEqual(cluster_posts(self.inferences_dict, 0, 0.5), [['1', '2']])
+        self.assertEqual(cluster_posts({'3': self.inferences_dict['3']}, 0, 0.5), [])
+
+class RetrievalInferencesTestCase(ForumTestCase):
+    '''
+    Tests for making a forum's inferences with retrieval
+    '''
+
+    messages = ['I like cats.', 'Dogs bark.', 'Fish swim.', 'Cats purr.']
+
+    def test_skipped_posts(self):
+        forum_id = self.create_forum(self.messages)
+
+        with mock.patch.object(views, 'make_inferences', wraps=views.make_inferences) as make_inferences:
+            response = Client().post(
+                '/foruminference/',
+                json.dumps({
+                    'forum_id': str(forum_id),
+                    'questions': ['cats?', 'dogs?'],
+                    'retrieval_top_k': 1
+                }),
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+
+        data = json.loads(b''.join(response.streaming_content))['data']
+
+        # 4 posts x 2 questions, QA only runs on the top post of each question
+        self.assertEqual(make_inferences.call_count, 2)
+        self.assertEqual(data['qa_calls_saved'], 6)
+
+        inferences = slice_inferences(self.inference_location(forum_id))['inferences']
+
+        self.assertEqual(inferences, data['inferences'])
+
+        answered = {
+            (post_id, question_ind)
+            for post_id, answers in inferences.items()
+            for question_ind, inference in enumerate(answers)
+            if not inference.get('skipped')
+        }
+
+        # "Cats purr." is closest to "cats?", "Dogs bark." to "dogs?"
+        self.assertEqual(answered, {('4', 0), ('2', 1)})
+
+        for post_id, answers in inferences.items():
+            for question_ind, inference in enumerate(answers):
+                if (post_id, question_ind) not in answered:
+                    self.assertEqual(inference, answer('', None, skipped=True))
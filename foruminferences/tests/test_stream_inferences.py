@@ -0,0 +1,34 @@
+import json
+
+from django.test import Client
+
+from foruminferences.artifacts import slice_inferences
+from foruminferences.models import ForumInferences
+from foruminferences.tests import ForumTestCase
+
+class StreamInferencesTestCase(ForumTestCase):
+    '''
+    Tests for streaming a forum's inferences as NDJSON
+    '''
+
+    def test_stream(self):
+        forum_id = self.create_forum(['I like cats.', 'Dogs bark.', 'Fish swim.'])
+
+        response = Client().post(
+            '/foruminference/',
+            json.dumps({'forum_id': str(forum_id), 'questions': ['Who?'], 'stream': True}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(lines[0], {'questions': ['Who?'], 'model_tier': 'accurate'})
+        self.assertEqual(lines[-1], {'message': 'Successfuly made inferences', 'qa_calls_saved': 0})
+
+        inferences = slice_inferences(self.inference_location(forum_id))['inferences']
+
+        self.assertEqual({line['post_id']: line['answers'] for line in lines[1:-1]}, inferences)
+        self.assertTrue(ForumInferences.objects.filter(forum_id=forum_id).exists())
@@ -1,19 +1,63 @@
+import asyncio
+import itertools
 import json
+import logging
 import os
 
-from rest_framework.views import APIView
-from rest_framework.response import Response
+import numpy as np
 
+from asgiref.sync import sync_to_async
+
+from django.db import transaction
+from django.http import JsonResponse
+
+from inferencebackend.concurrency import (
+    AdmissionRejected,
+    ThreadStream,
+    inference_admission,
+    read_json,
+    run_blocking,
+    submit_model_task
+)
 from inferencebackend.utils import forum_csv_to_df
-from inferencebackend.settings import INFERENCES_FILE_LOCATION, NUM_CORES, QA_MODEL_NAME, SENT_MODEL_NAME
+from inferencebackend.views import AsyncAPIView, AsyncStreamingHttpResponse, too_many_requests
+from inferencebackend.settings import (
+    CLUSTER_CACHE_SIZE,
+    CLUSTER_SIMILARITY_DECIMALS,
+    DEFAULT_MODEL_TIER,
+    INFERENCE_ADMISSION_UNIT,
+    INFERENCES_FILE_LOCATION,
+    INFERENCES_PAGE_SIZE,
+    INFERENCE_STREAM_BUFFER,
+    NUM_CORES
+)
 
 from forums.models import Forums
 
 from foruminferences.models import ForumInferences
-from foruminferences.forms import PostRelationsForm
-
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer, util
+from foruminferences.artifacts import (
+    InferenceCheckpoint,
+    InferenceInProgress,
+    InferenceLock,
+    InferencesExist,
+    QuestionNotInferred,
+    inference_file_name,
+    iter_inferences_json,
+    remove_inference_progress,
+    slice_inferences,
+    write_inferences_atomic
+)
+from foruminferences.clustering import cluster_posts
+from foruminferences.forms import (
+    InferencesForm,
+    InferencesQueryForm,
+    PostClustersForm,
+    PostRelationsForm,
+    QuestionInferenceForm
+)
+from foruminferences.ml import load_models, sentence_util
+
+logger = logging.getLogger(__name__)
 
 def cosine_similarity(vec1, vec2):
     '''
@@ -27,7 +71,13 @@ def cosine_similarity(vec1, vec2):
         Similarity between two sentence vectors (float)
     '''
 
-    return util.pytorch_cos_sim(vec1, vec2).tolist()[0][0]
+    # numpy rather than torch, so reading inferences never loads the ML stack
+    vec1 = np.asarray(vec1, dtype=np.float32)
+    vec2 = np.asarray(vec2, dtype=np.float32)
+
+    norms = np.linalg.norm(vec1) * np.linalg.norm(vec2)
+
+    return float(vec1 @ vec2 / max(norms, 1e-12))
 
 def make_inferences(qa_model, sent_model, question, context):
     '''
@@ -68,126 +118,603 @@ def make_inferences(qa_model, sent_model, question, context):
         'answer_embedding': answer_embedding.tolist()
     }
 
-class InferencesView(APIView):
-    def get(self, request):
+def retrieve_posts(sent_model, questions, messages, threshold=None, top_k=None):
+    '''
+    Pick the posts worth running the QA model on for each question, by
+    similarity between the question and the whole post
+
+    Args:
+        sent_model: SentenceTransformer
+        questions: list of questions
+        messages: list of post messages
+        threshold (optional): minimum question/post cosine similarity
+        top_k (optional): only keep the k most similar posts for each question
+
+    If both threshold and top_k are given a post has to pass both.
+
+    Returns:
+        List (one per question) of sets of indices into messages
+    '''
+
+    # every question and post is embedded once
+    question_embeddings = sent_model.encode(questions)
+    post_embeddings = sent_model.encode(messages)
+
+    similarities = sentence_util().pytorch_cos_sim(question_embeddings, post_embeddings).tolist()
+
+    retrieved_posts = []
+
+    for question_similarities in similarities:
+        post_inds = sorted(
+            range(len(question_similarities)),
+            key=lambda post_ind: question_similarities[post_ind],
+            reverse=True
+        )
+
+        if top_k is not None:
+            post_inds = post_inds[:top_k]
+
+        if threshold is not None:
+            post_inds = [
+                post_ind for post_ind in post_inds if question_similarities[post_ind] > threshold
+            ]
+
+        retrieved_posts.append(set(post_inds))
+
+    return retrieved_posts
+
+def no_answer():
+    '''
+    Inference for a post that was skipped by retrieval. It has no answer
+    embedding, so it is never compared with other answers.
+    '''
+
+    return {
+        'answer': '',
+        'start_ind': 0,
+        'end_ind': 0,
+        'answer_embedding': None,
+        'skipped': True
+    }
+
+def infer_forum(
+    forum_df,
+    questions,
+    checkpoint,
+    retrieval_threshold=None,
+    retrieval_top_k=None,
+    model_tier=DEFAULT_MODEL_TIER,
+    models=None,
+    on_post=None
+):
+    '''
+    Make inferences for every question on every post of a forum. Each post's
+    answers are appended to the checkpoint as soon as they are made, so only
+    one post is held in memory at a time.
+
+    Args:
+        forum_df: pandas DataFrame of forum posts
+        questions: list of questions
+        checkpoint: InferenceCheckpoint to resume from and record progress to
+        retrieval_threshold (optional): only run QA on posts this similar to the question
+        retrieval_top_k (optional): only run QA on the k posts most similar to the question
+        model_tier (optional): key of MODEL_TIERS for the models to use
+        models (optional): already loaded (qa_model, sent_model) of model_tier, loaded here if not given
+        on_post (optional): called with (post id, list of inferences) for every post,
+            including posts finished by a previous run
+
+    Returns:
+        Number of QA model calls skipped by retrieval
+    '''
+
+    completed_post_ids = checkpoint.load()
+
+    if on_post:
+        for post_id, post_answers in checkpoint.iter_records():
+            on_post(post_id, post_answers)
+
+    # skip posts finished by a previous run
+    remaining_posts = [
+        post for post in forum_df.itertuples() if str(post.id) not in completed_post_ids
+    ]
+
+    qa_calls_saved = 0
+
+    use_retrieval = retrieval_threshold is not None or retrieval_top_k is not None
+
+    if remaining_posts:
+        qa_model, sent_model = models or load_models(model_tier)
+
+        if use_retrieval:
+            retrieved_posts = retrieve_posts(
+                sent_model,
+                questions,
+                forum_df['message'].tolist(),
+                threshold=retrieval_threshold,
+                top_k=retrieval_top_k
+            )
+
+            skipped_answer = no_answer()
+
+        # position of each post in forum_df, used to look up retrieval results
+        post_inds = {post.id: post_ind for post_ind, post in enumerate(forum_df.itertuples())}
+
+    for post in remaining_posts: # iterate through each post
+        post_answers = []
+
+        for question_ind, question in enumerate(questions): # then each question
+            if use_retrieval and post_inds[post.id] not in retrieved_posts[question_ind]:
+                post_answers.append(skipped_answer)
+                qa_calls_saved += 1
+
+                continue
+
+            post_answers.append(
+                make_inferences(
+                    qa_model, 
+                    sent_model, 
+                    question, 
+                    post.message
+                )
+            )
+
+        checkpoint.append(str(post.id), post_answers)
+
+        if on_post:
+            on_post(str(post.id), post_answers)
+
+    checkpoint.flush()
+
+    return qa_calls_saved
+
+def create_forum_inferences(
+    forum_obj,
+    questions,
+    retrieval_options=None,
+    model_tier=DEFAULT_MODEL_TIER,
+    models=None,
+    on_post=None,
+    forum_df=None,
+    lock=None
+):
+    '''
+    Make inferences for a forum, write the inference file and save the
+    ForumInferences object. Resumes from the checkpoint of an interrupted run.
+
+    Args:
+        forum_obj: Forums
+        questions: list of questions
+        retrieval_options (optional): retrieval_threshold and retrieval_top_k for infer_forum
+        model_tier (optional): key of MODEL_TIERS for the models to use
+        models (optional): already loaded (qa_model, sent_model) of model_tier
+        on_post (optional): called with (post id, list of inferences) as each post is done
+        forum_df (optional): forum posts already read from the forum CSV
+        lock (optional): the forum's InferenceLock, already acquired by the caller.
+            Acquired here if not given, released when the job ends either way
+
+    Returns:
+        Tuple of
+            - ForumInferences
+            - number of posts
+            - number of QA model calls skipped by retrieval
+
+    Raises:
+        InferenceInProgress: another job holds the forum's lock
+        InferencesExist: the forum already has inferences
+    '''
+
+    retrieval_options = retrieval_options or {}
+
+    file_name = inference_file_name(forum_obj)
+
+    if lock is None:
+        lock = InferenceLock(file_name)
+        lock.acquire()
+
+    checkpoint = None
+
+    try:
+        # another job may have finished just before the lock was taken
+        if ForumInferences.objects.filter(forum=forum_obj).exists():
+            raise InferencesExist(f'Inferences already exist for forum {forum_obj.id}')
+
+        if forum_df is None:
+            forum_df = forum_csv_to_df(forum_obj)
+
+        # a checkpoint is only resumed with the same models, so embeddings are never mixed
+        checkpoint = InferenceCheckpoint(
+            file_name,
+            questions,
+            options={**retrieval_options, 'model_tier': model_tier}
+        )
+
+        qa_calls_saved = infer_forum(
+            forum_df,
+            questions,
+            checkpoint,
+            model_tier=model_tier,
+            models=models,
+            on_post=on_post,
+            **retrieval_options
+        )
+
+        # the checkpoint is copied post by post, skipping posts no longer in the forum
+        forum_post_ids = {str(post_id) for post_id in forum_df['id']}
+
+        write_inferences_atomic(
+            INFERENCES_FILE_LOCATION + file_name,
+            questions,
+            (record for record in checkpoint.iter_records() if record[0] in forum_post_ids)
+        )
+
+        forum_inferences = ForumInferences.objects.create(
+            forum=forum_obj, 
+            inferences=file_name,
+            model_tier=model_tier
+        )
+
+        checkpoint.remove()
+    finally:
+        # a failed job's finished posts are on disk before another job can resume them
+        if checkpoint is not None:
+            checkpoint.close()
+
+        lock.release()
+
+    return forum_inferences, len(forum_df), qa_calls_saved
+
+def infer_posts(posts, question, model_tier=DEFAULT_MODEL_TIER):
+    '''
+    Make inferences for a single question on a list of posts
+
+    Args:
+        posts: list of post tuples from a forum DataFrame
+        question: string
+        model_tier (optional): key of MODEL_TIERS for the models to use
+
+    Returns:
+        Dictionary of post id -> inference
+    '''
+
+    qa_model, sent_model = load_models(model_tier)
+
+    inferences = {}
+
+    for post in posts: # iterate through each post
+        inferences[post.id] = make_inferences(
+            qa_model, 
+            sent_model, 
+            question, 
+            post.message
+        )
+
+    return inferences
+
+def find_post_relations(inferences_dict, question_ind, base_answer, base_similarity):
+    '''
+    Find posts whose answer is similar to a base answer. Posts skipped by
+    retrieval have no answer and are never related.
+
+    Args:
+        inferences_dict: dictionary of post id -> list of inferences
+        question_ind: index of the question in each list of inferences
+        base_answer: inference to compare every other answer to
+        base_similarity: minimum cosine similarity for a related post
+
+    Returns:
+        Dictionary of post id -> post id and similarity
+    '''
+
+    filtered_inferences = {}
+
+    if base_answer.get('skipped'):
+        return filtered_inferences
+
+    for post_id, answers in inferences_dict.items():
+        if answers[question_ind].get('skipped'):
+            continue
+
+        answer_embedding = answers[question_ind].get('answer_embedding')
+        
+        answers_cosine_similarity = cosine_similarity(
+            base_answer.get('answer_embedding'), 
+            answer_embedding
+        )
+
+        if answers_cosine_similarity > base_similarity:
+            filtered_inferences[post_id] = {
+                'post_id': post_id,
+                'similarity': answers_cosine_similarity
+            }
+
+    return filtered_inferences
+
+def save_clusters(forum_inferences_id, cluster_key, clusters):
+    '''
+    Add clusters to a forum's cluster cache, dropping entries past
+    CLUSTER_CACHE_SIZE. The row is locked while it is updated so concurrent
+    requests don't overwrite each other's entries.
+    '''
+
+    with transaction.atomic():
+        forum_inferences = ForumInferences.objects.select_for_update().only('clusters').get(
+            id=forum_inferences_id
+        )
+
+        cached_clusters = forum_inferences.clusters
+
+        cached_clusters.pop(cluster_key, None)
+
+        while cached_clusters and len(cached_clusters) >= CLUSTER_CACHE_SIZE:
+            del cached_clusters[next(iter(cached_clusters))]
+
+        cached_clusters[cluster_key] = clusters
+
+        forum_inferences.save(update_fields=['clusters'])
+
+def estimate_inference_cost(messages, questions):
+    '''
+    Estimate the work of an inference request for admission control
+
+    Args:
+        messages: list of post messages questions will be asked on
+        questions: list of questions
+
+    Returns:
+        Cost in INFERENCE_ADMISSION_UNIT: 1 slot, or the number of words the
+        QA model reads (every post and question, once per pair)
+    '''
+
+    if INFERENCE_ADMISSION_UNIT != 'tokens':
+        return 1
+
+    post_words = sum(len(message.split()) for message in messages if isinstance(message, str))
+    question_words = sum(len(question.split()) for question in questions)
+
+    return post_words * len(questions) + question_words * len(messages)
+
+def model_tier_matches(form, forum_inferences):
+    '''
+    Check the model tier a request expects against the tier that made a
+    forum's inferences, so embeddings from different models are never compared
+    '''
+
+    model_tier = form.cleaned_data.get('model_tier')
+
+    return not model_tier or model_tier == forum_inferences.model_tier
+
+class InferencesView(AsyncAPIView):
+    async def get(self, request):
         '''
         Get inference files for forum
 
         Request parameters
             - forum_id -> id of forum to get inferences for
+            - question (optional, repeatable) -> only return answers for these questions
+            - post_id_start (optional) -> smallest post id to return
+            - post_id_end (optional) -> largest post id to return
+            - page (optional) -> 1-indexed page of posts
+            - page_size (optional) -> posts per page
+            - include_embeddings (optional) -> "false" to leave out answer embeddings
         '''
 
-        forum_id = request.GET.get('forum_id')
+        inferences_query_form = InferencesQueryForm(request.GET)
 
-        if not forum_id:
-            return Response({'message': 'Invalid response data'}, status=400)
+        if not inferences_query_form.is_valid():
+            return JsonResponse({'message': 'Invalid response data'}, status=400)
+
+        forum_id = inferences_query_form.cleaned_data.get('forum_id')
 
         try:
-            forum_obj = Forums.objects.get(id=forum_id)
+            forum_obj = await sync_to_async(Forums.objects.get)(id=forum_id)
         except Forums.DoesNotExist:
-            return Response({'message': 'Forum does not exist'}, status=404)
+            return JsonResponse({'message': 'Forum does not exist'}, status=404)
 
         # if there are no inferences for forum object
         if not (
-            forum_inferences := ForumInferences.objects.filter(forum=forum_obj).first()
+            forum_inferences := await sync_to_async(
+                ForumInferences.objects.filter(forum=forum_obj).defer('clusters').first
+            )()
         ):
-            return Response({'message': 'No inferences exist for forum'}, status=404)
+            return JsonResponse({'message': 'No inferences exist for forum'}, status=404)
 
-        with open(INFERENCES_FILE_LOCATION + forum_inferences.inferences.name) as inference_file:
-            inference_dict = json.loads(inference_file.read())
+        page = inferences_query_form.cleaned_data.get('page')
+        page_size = inferences_query_form.cleaned_data.get('page_size')
 
-            return Response(
-                {
-                    'message': 'Successfuly retrieved inferences', 
-                    'data': inference_dict
-                }, 
-                status=200
+        if page or page_size:
+            page = page or 1
+            page_size = page_size or INFERENCES_PAGE_SIZE
+
+        include_embeddings = inferences_query_form.cleaned_data.get('include_embeddings')
+
+        try:
+            inference_dict = await run_blocking(
+                slice_inferences,
+                INFERENCES_FILE_LOCATION + forum_inferences.inferences.name,
+                questions=request.GET.getlist('question'),
+                post_id_start=inferences_query_form.cleaned_data.get('post_id_start'),
+                post_id_end=inferences_query_form.cleaned_data.get('post_id_end'),
+                page=page,
+                page_size=page_size,
+                include_embeddings=include_embeddings is not False
             )
+        except QuestionNotInferred:
+            return JsonResponse({'message': 'No inferences were made for question'}, status=404)
+
+        inference_dict['model_tier'] = forum_inferences.model_tier
 
-    def post(self, request):
+        return JsonResponse(
+            {
+                'message': 'Successfuly retrieved inferences', 
+                'data': inference_dict
+            }, 
+            status=200
+        )
+
+    async def post(self, request):
         '''
         Create inferences for forum
 
         Request body
             - forum_id -> id of the forum to make inferences on
             - questions -> list of questions
+            - retrieval_threshold (optional) -> only answer questions on posts at least this similar to them
+            - retrieval_top_k (optional) -> only answer questions on their k most similar posts
+            - model_tier (optional) -> key of MODEL_TIERS, e.g. "fast" or "accurate"
+            - stream (optional) -> true to get NDJSON lines as each post is done
+
+        Returns 409 while another inference job is running for the forum
         '''
 
         forum_id = request.data.get('forum_id')
         questions = request.data.get('questions')
+
+        inferences_form = InferencesForm(request.data)
         
-        if not forum_id or not questions:
-            return Response({'message': 'Invalid request data'}, status=400)
+        if not forum_id or not questions or not inferences_form.is_valid():
+            return JsonResponse({'message': 'Invalid request data'}, status=400)
+
+        retrieval_options = {
+            'retrieval_threshold': inferences_form.cleaned_data.get('retrieval_threshold'),
+            'retrieval_top_k': inferences_form.cleaned_data.get('retrieval_top_k')
+        }
+
+        model_tier = inferences_form.cleaned_data.get('model_tier') or DEFAULT_MODEL_TIER
 
         try:
-            forum_obj = Forums.objects.get(id=forum_id)
+            forum_obj = await sync_to_async(Forums.objects.get)(id=forum_id)
         except Forums.DoesNotExist:
-            return Response({'message': 'Forum does not exist'}, status=404)
+            return JsonResponse({'message': 'Forum does not exist'}, status=404)
 
-        if ForumInferences.objects.filter(forum=forum_obj).exists():
-            return Response({'message': 'An inference already exists for this forum'}, status=400)
+        # held until the job ends, so a resubmitted request can't start a second job
+        lock = InferenceLock(inference_file_name(forum_obj))
 
-        forum_df = forum_csv_to_df(forum_obj)
+        try:
+            await run_blocking(lock.acquire)
+        except InferenceInProgress:
+            return JsonResponse({'message': 'Inferences are already being made for this forum'}, status=409)
 
-        # Make Inferences
+        # once the job has started it releases the lock itself
+        job_started = False
 
-        qa_model = pipeline(
-            'question-answering', 
-            model=QA_MODEL_NAME, 
-            tokenizer=QA_MODEL_NAME
-        )
+        try:
+            if await sync_to_async(ForumInferences.objects.filter(forum=forum_obj).exists)():
+                return JsonResponse({'message': 'An inference already exists for this forum'}, status=400)
 
-        sent_model = SentenceTransformer(SENT_MODEL_NAME)
-        
-        inferences = {}
-
-        for post in forum_df.itertuples(): # iterate through each post
-            post_answers = []
-
-            for question in questions: # then each question
-                post_answers.append(
-                    make_inferences(
-                        qa_model, 
-                        sent_model, 
-                        question, 
-                        post.message
-                    )
+            forum_df = await run_blocking(forum_csv_to_df, forum_obj)
+
+            # wait for capacity, or turn the request away if too many are waiting
+            try:
+                admission_cost = await inference_admission.acquire(
+                    estimate_inference_cost(forum_df['message'].tolist(), questions)
+                )
+            except AdmissionRejected as rejection:
+                return too_many_requests(rejection.retry_after)
+
+            # Make Inferences
+
+            if inferences_form.cleaned_data.get('stream'):
+                response = self.stream_inferences(
+                    forum_obj,
+                    forum_df,
+                    questions,
+                    retrieval_options,
+                    model_tier,
+                    admission_cost,
+                    lock
                 )
 
-            inferences[post.id] = post_answers
+                job_started = True
 
-        full_data = {
-            'questions': questions,
-            'inferences': inferences
-        }
+                return response
 
-        forum_file_name = forum_obj.get_file_name()
+            job = submit_model_task(
+                create_forum_inferences,
+                forum_obj,
+                questions,
+                retrieval_options,
+                model_tier,
+                forum_df=forum_df,
+                lock=lock
+            )
 
-        inference_file_name = f'{forum_file_name}_inferences.json'
-        inference_file_location = INFERENCES_FILE_LOCATION + inference_file_name
+            job_started = True
 
-        open(inference_file_location, 'x') # create inference file
+            # released when the job ends, not when a client that went away stops waiting for it
+            job.add_done_callback(lambda _: inference_admission.release(admission_cost))
 
-        with open(inference_file_location, 'w') as forum_inference:
-            forum_inference.write(
-                json.dumps(full_data)
-            )
-        
-        ForumInferences.objects.create(
-            forum=forum_obj, 
-            inferences=inference_file_name
+            # shielded so a client that goes away doesn't cancel a job holding the lock
+            forum_inferences, _, qa_calls_saved = await asyncio.shield(asyncio.wrap_future(job))
+        finally:
+            if not job_started:
+                await run_blocking(lock.release)
+
+        # the response is read back from the inference file a post at a time
+        data_chunks = iter_inferences_json(
+            INFERENCES_FILE_LOCATION + forum_inferences.inferences.name,
+            qa_calls_saved=qa_calls_saved,
+            model_tier=model_tier
         )
 
-        return Response(
-            {
-                'message': 'Successfuly made inferences', 
-                'data': full_data
-            }, 
+        return AsyncStreamingHttpResponse(
+            itertools.chain(
+                ['{"message": "Successfuly made inferences", "data": '],
+                data_chunks,
+                ['}']
+            ),
+            content_type='application/json',
             status=200
         )
 
-class PostRelationsView(APIView):
-    def post(self, request):
+    def stream_inferences(self, forum_obj, forum_df, questions, retrieval_options, model_tier, admission_cost, lock):
+        '''
+        Make inferences in the background and stream them as NDJSON: a line
+        with the questions, a line per post as soon as it is done, then a
+        final line with the message (and qa_calls_saved on success).
+        The admission cost and the forum's lock are released when the
+        background job ends.
+        '''
+
+        lines = ThreadStream(maxsize=INFERENCE_STREAM_BUFFER)
+
+        lines.put({'questions': questions, 'model_tier': model_tier})
+
+        def on_post(post_id, post_answers):
+            lines.put({'post_id': post_id, 'answers': post_answers})
+
+        def run():
+            try:
+                _, _, qa_calls_saved = create_forum_inferences(
+                    forum_obj,
+                    questions,
+                    retrieval_options,
+                    model_tier,
+                    on_post=on_post,
+                    forum_df=forum_df,
+                    lock=lock
+                )
+
+                lines.put({'message': 'Successfuly made inferences', 'qa_calls_saved': qa_calls_saved})
+            except Exception:
+                # nothing waits on the job's future, so the error is logged here
+                logger.exception('Failed to make inferences for forum %s', forum_obj.id)
+
+                lines.put({'message': 'Failed to make inferences'})
+            finally:
+                inference_admission.release(admission_cost)
+
+                lines.close()
+
+        submit_model_task(run)
+
+        return AsyncStreamingHttpResponse(
+            (json.dumps(line) + '\n' for line in lines),
+            content_type='application/x-ndjson',
+            status=200
+        )
+
+class PostRelationsView(AsyncAPIView):
+    async def post(self, request):
         '''
         Make a list of forum posts with cosine similarity greater than user input (for a given quesiton)
 
@@ -196,31 +723,35 @@ class PostRelationsView(APIView):
             - forum_id -> id for forum to be used
             - post_id -> id for post to be used as a baseline
             - similarity -> the cosine similarity baseline for similar posts
+            - model_tier (optional) -> only compare embeddings made by this model tier
         '''
         
         post_relations_form = PostRelationsForm(request.data)
 
         if not post_relations_form.is_valid():
-            return Response({'message': 'Invalid request data'}, status=400)
+            return JsonResponse({'message': 'Invalid request data'}, status=400)
 
         try:
             forum_id = post_relations_form.cleaned_data.get('forum_id')
 
-            forum_obj = Forums.objects.get(
+            forum_obj = await sync_to_async(Forums.objects.get)(
                 id=forum_id
             )
         except Forums.DoesNotExist:
-            return Response({'message': 'Forum does not exist'}, status=404)
+            return JsonResponse({'message': 'Forum does not exist'}, status=404)
         
         try:
-            forum_inferences = ForumInferences.objects.get(forum=forum_obj)
+            forum_inferences = await sync_to_async(
+                ForumInferences.objects.defer('clusters').get
+            )(forum=forum_obj)
         except ForumInferences.DoesNotExist:
-            return Response({'message': 'Inferences do not exist for forum'}, status=404)
-        
-        inferences = {}
+            return JsonResponse({'message': 'Inferences do not exist for forum'}, status=404)
 
-        with open(INFERENCES_FILE_LOCATION + forum_inferences.inferences.name) as inference_file:
-            inferences = json.loads(inference_file.read())
+        if not model_tier_matches(post_relations_form, forum_inferences):
+            return JsonResponse({'message': 'Inferences were made with a different model tier'}, status=400)
+        
+        # parsed off the event loop, every answer carries a full embedding
+        inferences = await read_json(INFERENCES_FILE_LOCATION + forum_inferences.inferences.name)
         
         question = post_relations_form.cleaned_data.get('question')
         inferenced_questions = inferences.get('questions')
@@ -228,9 +759,7 @@ class PostRelationsView(APIView):
 
         # if no inferences were made for given question
         if not question in inferenced_questions:
-            return Response({'message': 'No inferences were made for question'}, status=404)
-
-        filtered_inferences = {}
+            return JsonResponse({'message': 'No inferences were made for question'}, status=404)
 
         question_ind = inferenced_questions.index(question)
 
@@ -239,27 +768,21 @@ class PostRelationsView(APIView):
         if not (
             base_inference := inferences_dict.get(post_id)
         ): 
-            return Response({'message': 'Post ID does not exist on forum'}, status=404)
+            return JsonResponse({'message': 'Post ID does not exist on forum'}, status=404)
 
         base_answer = base_inference[question_ind]
 
         base_similarity = post_relations_form.cleaned_data.get('similarity')
 
-        for post_id, answers in inferences_dict.items():
-            answer_embedding = answers[question_ind].get('answer_embedding')
-            
-            answers_cosine_similarity = cosine_similarity(
-                base_answer.get('answer_embedding'), 
-                answer_embedding
-            )
-
-            if answers_cosine_similarity > base_similarity:
-                filtered_inferences[post_id] = {
-                    'post_id': post_id,
-                    'similarity': answers_cosine_similarity
-                }
+        filtered_inferences = await run_blocking(
+            find_post_relations,
+            inferences_dict,
+            question_ind,
+            base_answer,
+            base_similarity
+        )
 
-        return Response(
+        return JsonResponse(
             {
                 'message': 'Successfuly grouped posts', 
                 'data': filtered_inferences
@@ -267,8 +790,83 @@ class PostRelationsView(APIView):
             status=200
         )
 
-class QuestionInferenceView(APIView):
-    def post(self, request):
+class PostClustersView(AsyncAPIView):
+    async def post(self, request):
+        '''
+        Group every post of a forum by answer similarity for a given question
+
+        Request body
+            - question -> question to cluster by
+            - forum_id -> id for forum to be used
+            - similarity -> the cosine similarity baseline for posts in the same group,
+              rounded to CLUSTER_SIMILARITY_DECIMALS
+            - method (optional) -> "components" (default) or "centroid"
+            - model_tier (optional) -> only compare embeddings made by this model tier
+        '''
+
+        post_clusters_form = PostClustersForm(request.data)
+
+        if not post_clusters_form.is_valid():
+            return JsonResponse({'message': 'Invalid request data'}, status=400)
+
+        try:
+            forum_id = post_clusters_form.cleaned_data.get('forum_id')
+
+            forum_obj = await sync_to_async(Forums.objects.get)(id=forum_id)
+        except Forums.DoesNotExist:
+            return JsonResponse({'message': 'Forum does not exist'}, status=404)
+
+        try:
+            forum_inferences = await sync_to_async(ForumInferences.objects.get)(forum=forum_obj)
+        except ForumInferences.DoesNotExist:
+            return JsonResponse({'message': 'Inferences do not exist for forum'}, status=404)
+
+        if not model_tier_matches(post_clusters_form, forum_inferences):
+            return JsonResponse({'message': 'Inferences were made with a different model tier'}, status=400)
+
+        question = post_clusters_form.cleaned_data.get('question')
+        # rounded so the cache holds a bounded set of thresholds
+        similarity = round(post_clusters_form.cleaned_data.get('similarity'), CLUSTER_SIMILARITY_DECIMALS)
+        method = post_clusters_form.cleaned_data.get('method') or 'components'
+
+        cluster_key = f'{method}:{similarity}:{question}'
+
+        # clusters are computed once per question and similarity
+        if (clusters := forum_inferences.clusters.get(cluster_key)) is None:
+            inferences = await read_json(INFERENCES_FILE_LOCATION + forum_inferences.inferences.name)
+
+            inferenced_questions = inferences.get('questions')
+
+            # if no inferences were made for given question
+            if not question in inferenced_questions:
+                return JsonResponse({'message': 'No inferences were made for question'}, status=404)
+
+            clusters = await run_blocking(
+                cluster_posts,
+                inferences.get('inferences'),
+                inferenced_questions.index(question),
+                similarity,
+                method
+            )
+
+            await sync_to_async(save_clusters)(forum_inferences.id, cluster_key, clusters)
+
+        return JsonResponse(
+            {
+                'message': 'Successfuly clustered posts',
+                'data': {
+                    'question': question,
+                    'similarity': similarity,
+                    'method': method,
+                    'model_tier': forum_inferences.model_tier,
+                    'clusters': clusters
+                }
+            },
+            status=200
+        )
+
+class QuestionInferenceView(AsyncAPIView):
+    async def post(self, request):
         '''
         Create inferences for a single question
 
@@ -276,50 +874,50 @@ class QuestionInferenceView(APIView):
             forum_id -> id of forum
             question -> question to make inferences for
             post_ids -> list of post ids to get answer for
+            model_tier (optional) -> key of MODEL_TIERS, e.g. "fast" or "accurate"
         '''
 
         forum_id = request.data.get('forum_id')
         question = request.data.get('question')
         post_ids = request.data.get('post_ids')
 
-        if not forum_id or not question or not post_ids:
-            return Response({'message': 'Invalid request data'}, status=400)
+        question_inference_form = QuestionInferenceForm(request.data)
+
+        if not forum_id or not question or not post_ids or not question_inference_form.is_valid():
+            return JsonResponse({'message': 'Invalid request data'}, status=400)
+
+        model_tier = question_inference_form.cleaned_data.get('model_tier') or DEFAULT_MODEL_TIER
 
         try:
-            forum_obj = Forums.objects.get(id=forum_id)
+            forum_obj = await sync_to_async(Forums.objects.get)(id=forum_id)
         except Forums.DoesNotExist:
-            return Response({'message': 'Forum does not exist'}, status=404)
+            return JsonResponse({'message': 'Forum does not exist'}, status=404)
 
-        forum = forum_csv_to_df(forum_obj)
+        forum = await run_blocking(forum_csv_to_df, forum_obj)
 
         posts = [post for post in forum.itertuples() if str(post.id) in post_ids]
 
         # Make inferences
 
-        qa_model = pipeline(
-            'question-answering', 
-            model=QA_MODEL_NAME, 
-            tokenizer=QA_MODEL_NAME
-        )
-
-        sent_model = SentenceTransformer(SENT_MODEL_NAME)
-        
-        inferences = {}
-
-        for post in posts: # iterate through each post
-            inferences[post.id] = make_inferences(
-                qa_model, 
-                sent_model, 
-                question, 
-                post.message
+        try:
+            admission_cost = await inference_admission.acquire(
+                estimate_inference_cost([post.message for post in posts], [question])
             )
+        except AdmissionRejected as rejection:
+            return too_many_requests(rejection.retry_after)
+
+        job = submit_model_task(infer_posts, posts, question, model_tier)
+        job.add_done_callback(lambda _: inference_admission.release(admission_cost))
+
+        inferences = await asyncio.wrap_future(job)
 
         full_data = {
             'question': question,
+            'model_tier': model_tier,
             'inferences': inferences
         }
 
-        return Response(
+        return JsonResponse(
             {
                 'message': 'Successfuly made inferences', 
                 'data': full_data
@@ -327,10 +925,10 @@ class QuestionInferenceView(APIView):
             status=200
         )
 
-class DeleteInferencesView(APIView):
-    def post(self, request):
+class DeleteInferencesView(AsyncAPIView):
+    async def post(self, request):
         '''
-        Delete inference file
+        Delete inference file, and the checkpoint of an unfinished inference job
 
         Request parameters: 
             forum_id: id of forum
@@ -339,18 +937,34 @@ class DeleteInferencesView(APIView):
         forum_id = request.data.get('forum_id')
 
         if not forum_id:
-            return Response({'message': 'Invalid request data'}, status=400)
+            return JsonResponse({'message': 'Invalid request data'}, status=400)
+
+        try:
+            forum_obj = await sync_to_async(Forums.objects.get)(id=forum_id)
+        except Forums.DoesNotExist:
+            return JsonResponse({'message': 'Forum does not exist'}, status=404)
+
+        file_name = inference_file_name(forum_obj)
+        lock = InferenceLock(file_name)
 
         try:
-            forum_obj = Forums.objects.get(id=forum_id)
-            forum_inferences = ForumInferences.objects.get(forum=forum_obj)
+            await run_blocking(lock.acquire)
+        except InferenceInProgress:
+            return JsonResponse({'message': 'Inferences are being made for this forum'}, status=409)
 
-            os.remove(INFERENCES_FILE_LOCATION + forum_inferences.inferences.name)
+        try:
+            await run_blocking(remove_inference_progress, file_name)
 
-            forum_inferences.delete()
+            forum_inferences = await sync_to_async(
+                ForumInferences.objects.defer('clusters').get
+            )(forum=forum_obj)
 
-            return Response({'message': 'Succesfuly deleted inferences'}, status=200)
-        except Forums.DoesNotExist:
-            return Response({'message': 'Forum does not exist'}, status=404)
+            await run_blocking(os.remove, INFERENCES_FILE_LOCATION + forum_inferences.inferences.name)
+
+            await sync_to_async(forum_inferences.delete)()
+
+            return JsonResponse({'message': 'Succesfuly deleted inferences'}, status=200)
         except ForumInferences.DoesNotExist:
-            return Response({'message': 'Inferences do not exist for forum'}, status=404)
+            return JsonResponse({'message': 'Inferences do not exist for forum'}, status=404)
+        finally:
+            await run_blocking(lock.release)
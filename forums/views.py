@@ -1,13 +1,16 @@
-from rest_framework.views import APIView
-from rest_framework.response import Response
+from asgiref.sync import sync_to_async
 
+from django.http import JsonResponse
+
+from inferencebackend.concurrency import run_blocking
 from inferencebackend.utils import forum_csv_to_array, forum_csv_to_df
+from inferencebackend.views import AsyncAPIView
 
 from forums.models import Forums
 from forums.forms import ForumPostsForm
 
-class ForumsView(APIView):
-    def get(self, request):
+class ForumsView(AsyncAPIView):
+    async def get(self, request):
         '''
         Get forum object from ID or get all forum objects
 
@@ -20,7 +23,7 @@ class ForumsView(APIView):
         if not forum_id: # if the request doesn't have a forum id
             serialized_forums = []
 
-            for forum in Forums.objects.all():
+            for forum in await sync_to_async(list)(Forums.objects.all()):
                 serialized_forums.append(
                     {
                         'id': str(forum.id),
@@ -28,34 +31,34 @@ class ForumsView(APIView):
                     }
                 )
 
-            return Response(
+            return JsonResponse(
                 {
-                    'message': 'Successfuly fetched all forums', 
+                    'message': 'Successfuly fetched all forums',
                     'data': serialized_forums
-                }, 
+                },
                 status=200
             )
         else:
             try:
-                forum = Forums.objects.get(id=forum_id)
+                forum = await sync_to_async(Forums.objects.get)(id=forum_id)
 
                 serialized_forum = {
                     'id': str(forum.id),
                     'name': forum.get_file_name(),
-                    'posts': forum_csv_to_array(forum)
+                    'posts': await run_blocking(forum_csv_to_array, forum)
                 }
 
-                return Response(
+                return JsonResponse(
                     {
                         'message': 'Successfuly fetched forum',
                         'data': serialized_forum
-                    }, 
+                    },
                     status=200
                 )
             except Forums.DoesNotExist:
-                return Response({'message': 'Forum does not exist'}, status=404)
+                return JsonResponse({'message': 'Forum does not exist'}, status=404)
 
-    def post(self, request):
+    async def post(self, request):
         '''
         Create forum object from CSV file
 
@@ -66,20 +69,20 @@ class ForumsView(APIView):
         csv_file = request.data.get('file')
 
         if not csv_file:
-            return Response({'message': 'Invalid request data'}, status=400)
+            return JsonResponse({'message': 'Invalid request data'}, status=400)
 
-        forum = Forums.objects.create(csv_file=csv_file)
+        forum = await sync_to_async(Forums.objects.create)(csv_file=csv_file)
 
-        return Response(
+        return JsonResponse(
             {
-                'message': 'Successfuly created forum', 
+                'message': 'Successfuly created forum',
                 'data': str(forum.id)
-            }, 
+            },
             status=200
         )
 
-class ForumPostsView(APIView):
-    def get(self, request):
+class ForumPostsView(AsyncAPIView):
+    async def get(self, request):
         '''
         Get specific post information from post id and forum id
 
@@ -91,16 +94,16 @@ class ForumPostsView(APIView):
         forum_posts_form = ForumPostsForm(request.GET)
 
         if not forum_posts_form.is_valid():
-            return Response({'message': 'Invalid request data'}, status=400)
+            return JsonResponse({'message': 'Invalid request data'}, status=400)
 
         try:
             forum_id = forum_posts_form.cleaned_data.get('forum_id')
 
-            forum_obj = Forums.objects.get(id=forum_id)
+            forum_obj = await sync_to_async(Forums.objects.get)(id=forum_id)
         except Forums.DoesNotExist:
-            return Response({'message': 'Forums does not exist'}, status=404)
-        
-        forum_df = forum_csv_to_df(forum_obj)
+            return JsonResponse({'message': 'Forums does not exist'}, status=404)
+
+        forum_df = await run_blocking(forum_csv_to_df, forum_obj)
 
         post = forum_df.loc[
             forum_df.get('id') == int(
@@ -115,10 +118,10 @@ class ForumPostsView(APIView):
             'message': post.iloc[0, 3]
         }
 
-        return Response(
+        return JsonResponse(
             {
-                'message': 'Successfuly retrieved post', 
+                'message': 'Successfuly retrieved post',
                 'data': post_dict
-            }, 
+            },
             status=200
         )
@@ -1,7 +1,60 @@
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from django.core.handlers.asgi import ASGIHandler
+
+from inferencebackend.settings import WARM_UP_MODELS
+
+from foruminferences.ml import start_warm_up
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inferencebackend.settings')
 
-application = get_asgi_application()
+class StreamingASGIHandler(ASGIHandler):
+    '''
+    ASGI handler that sends AsyncStreamingHttpResponse bodies without blocking
+    the event loop between chunks, and answers lifespan events so models can
+    be warmed up once the server is accepting requests
+    '''
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        await super().__call__(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message['type'] == 'lifespan.startup':
+                if WARM_UP_MODELS:
+                    start_warm_up()
+
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+
+                return
+
+    async def send_response(self, response, send):
+        if not hasattr(response, 'async_streaming_content'):
+            return await super().send_response(response, send)
+
+        async_content = response.async_streaming_content()
+
+        # the base handler sends headers and the closing message, the body is sent here
+        response.streaming_content = ()
+
+        async def send_with_content(message):
+            if message['type'] == 'http.response.body' and 'body' not in message:
+                async for part in async_content:
+                    await send({'type': 'http.response.body', 'body': part, 'more_body': True})
+
+            await send(message)
+
+        await super().send_response(response, send_with_content)
+
+django.setup(set_prefix=False)
+
+application = StreamingASGIHandler()
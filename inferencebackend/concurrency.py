@@ -0,0 +1,224 @@
+import asyncio
+import json
+import queue
+import threading
+
+from collections import deque
+
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+
+from django.db import close_old_connections
+
+from inferencebackend.settings import (
+    INFERENCE_ADMISSION_UNIT,
+    INFERENCE_MAX_SLOTS,
+    INFERENCE_MAX_TOKENS,
+    INFERENCE_MAX_WAITING,
+    INFERENCE_RETRY_AFTER,
+    INFERENCE_WORKERS
+)
+
+# bounded pool for model-bound work so inference can't take every thread
+inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_WORKERS,
+    thread_name_prefix='inference'
+)
+
+def _with_db_connections(func, *args, **kwargs):
+    # no request signals fire on executor threads, so their connections are
+    # checked and closed around each task the way a request's would be
+    close_old_connections()
+
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+def submit_model_task(func, *args, **kwargs):
+    '''
+    Start model-bound work on the bounded inference executor. The caller
+    can wait on the returned future, or attach callbacks that must run when
+    the work ends even if nothing is waiting for it any more (e.g. releasing
+    admission capacity, or feeding a streamed response).
+
+    Returns:
+        concurrent.futures.Future
+    '''
+
+    return inference_executor.submit(_with_db_connections, func, *args, **kwargs)
+
+async def run_blocking(func, *args, **kwargs):
+    '''
+    Run short blocking work (file I/O, CSV parsing) off the event loop
+
+    Args:
+        func: blocking callable
+        *args, **kwargs: arguments passed to func
+
+    Returns:
+        Return value of func
+    '''
+
+    return await sync_to_async(func, thread_sensitive=False)(*args, **kwargs)
+
+def _read_file(path):
+    with open(path) as file:
+        return file.read()
+
+async def read_file(path):
+    '''
+    Read a text file without blocking the event loop
+    '''
+
+    return await run_blocking(_read_file, path)
+
+def _read_json(path):
+    with open(path) as file:
+        return json.load(file)
+
+async def read_json(path):
+    '''
+    Read and parse a JSON file without blocking the event loop
+    '''
+
+    return await run_blocking(_read_json, path)
+
+class ThreadStream:
+    '''
+    Iterator over items put by another thread, ended by close()
+
+    At most maxsize items are buffered, so put blocks while the reader is
+    behind. Once the reader stops iterating (e.g. the client went away) items
+    are dropped instead, so the writer is never blocked for good.
+    '''
+
+    _closed = object()
+
+    def __init__(self, maxsize=0):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._abandoned = threading.Event()
+
+    def put(self, item):
+        while not self._abandoned.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        self.put(self._closed)
+
+    def __iter__(self):
+        try:
+            while (item := self._queue.get()) is not self._closed:
+                yield item
+        finally:
+            self._abandoned.set()
+
+class AdmissionRejected(Exception):
+    '''
+    Raised when a request can't run now and the wait queue is full
+    '''
+
+    def __init__(self, retry_after):
+        super().__init__(f'Wait queue is full, retry after {retry_after}s')
+
+        self.retry_after = retry_after
+
+class AdmissionController:
+    '''
+    Limits how much work runs at once. Requests acquire a cost (in slots or
+    estimated tokens) and wait first in first out when there isn't enough
+    capacity left, up to max_waiting requests.
+
+    State is guarded by a thread lock and waiters are woken on their own event
+    loop, so one controller works for ASGI and for WSGI threads.
+    '''
+
+    def __init__(self, capacity, max_waiting, retry_after):
+        self.capacity = capacity
+        self.max_waiting = max_waiting
+        self.retry_after = retry_after
+
+        self.in_use = 0
+        self.waiting = deque()
+        self.lock = threading.Lock()
+
+    async def acquire(self, cost):
+        '''
+        Wait until cost fits in the remaining capacity
+
+        Args:
+            cost: work the request will do, capped at the full capacity
+
+        Returns:
+            Cost acquired, to pass to release
+
+        Raises:
+            AdmissionRejected: the wait queue is full
+        '''
+
+        cost = max(1, min(cost, self.capacity))
+
+        with self.lock:
+            if not self.waiting and self.in_use + cost <= self.capacity:
+                self.in_use += cost
+
+                return cost
+
+            if len(self.waiting) >= self.max_waiting:
+                raise AdmissionRejected(self.retry_after)
+
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future(), cost)
+
+            self.waiting.append(waiter)
+
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self.lock:
+                admitted = waiter not in self.waiting
+
+                if not admitted:
+                    self.waiting.remove(waiter)
+
+            # woken up just as the request went away
+            if admitted:
+                self.release(cost)
+
+            raise
+
+        return cost
+
+    def release(self, cost):
+        '''
+        Give back capacity and admit waiting requests that now fit
+        '''
+
+        with self.lock:
+            self.in_use -= cost
+
+            while self.waiting and self.in_use + self.waiting[0][2] <= self.capacity:
+                loop, future, waiter_cost = self.waiting.popleft()
+
+                try:
+                    loop.call_soon_threadsafe(_admit, future)
+                except RuntimeError: # the waiter's event loop has closed
+                    continue
+
+                self.in_use += waiter_cost
+
+def _admit(future):
+    if not future.done():
+        future.set_result(None)
+
+inference_admission = AdmissionController(
+    INFERENCE_MAX_TOKENS if INFERENCE_ADMISSION_UNIT == 'tokens' else INFERENCE_MAX_SLOTS,
+    INFERENCE_MAX_WAITING,
+    INFERENCE_RETRY_AFTER
+)
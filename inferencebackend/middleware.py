@@ -0,0 +1,97 @@
+import asyncio
+import base64
+import json
+import threading
+import time
+
+from django.core.exceptions import MiddlewareNotUsed, RequestDataTooBig
+
+from inferencebackend.concurrency import run_blocking
+from inferencebackend.settings import REQUEST_LOG_FILE
+
+class RequestLogMiddleware:
+    '''
+    Append every API request to REQUEST_LOG_FILE as a JSON line, so real
+    traffic can be replayed with loadtest/replay.py. Unused unless
+    REQUEST_LOG_FILE is set.
+
+    Each line holds
+        - time -> unix time the request arrived
+        - method, path, query, content_type
+        - body -> base64 request body (null if it was too big to keep in memory)
+        - status -> response status code
+        - duration -> seconds until the response was returned
+        - created_id (POST only) -> id returned by the response, e.g. a new forum id
+    '''
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not REQUEST_LOG_FILE:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.lock = threading.Lock()
+
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        start_time = time.time()
+        body = self.read_body(request)
+
+        response = self.get_response(request)
+
+        self.write_record(request, body, response, start_time)
+
+        return response
+
+    async def __acall__(self, request):
+        start_time = time.time()
+        body = self.read_body(request)
+
+        response = await self.get_response(request)
+
+        await run_blocking(self.write_record, request, body, response, start_time)
+
+        return response
+
+    def read_body(self, request):
+        # the body has to be read before the view consumes the request stream
+        try:
+            return request.body
+        except RequestDataTooBig:
+            return None
+
+    def write_record(self, request, body, response, start_time):
+        if request.path.startswith('/admin/'):
+            return
+
+        record = {
+            'time': start_time,
+            'method': request.method,
+            'path': request.path,
+            'query': request.META.get('QUERY_STRING', ''),
+            'content_type': request.META.get('CONTENT_TYPE', ''),
+            'body': base64.b64encode(body).decode() if body is not None else None,
+            'status': response.status_code,
+            'duration': time.time() - start_time,
+        }
+
+        # ids created by a request are needed to rewrite later requests on replay
+        if request.method == 'POST' and not response.streaming and len(response.content) < 1024:
+            try:
+                created_id = json.loads(response.content).get('data')
+            except (ValueError, AttributeError):
+                created_id = None
+
+            if isinstance(created_id, str):
+                record['created_id'] = created_id
+
+        with self.lock:
+            with open(REQUEST_LOG_FILE, 'a') as request_log:
+                request_log.write(json.dumps(record) + '\n')
@@ -1,4 +1,5 @@
 import multiprocessing
+import os
 
 from pathlib import Path
 
@@ -14,9 +15,60 @@ FORUM_FILE_LOCATION = 'forum-csv-files/'
 
 NUM_CORES = multiprocessing.cpu_count()
 
+# max number of inference jobs running at once in a single process
+INFERENCE_WORKERS = max(1, NUM_CORES // 4)
+
+# admission control for inference requests (reads are never limited). Work is
+# measured in 'slots' (one per request) or estimated 'tokens' (words of every
+# post times questions); requests over the limit wait in a queue of at most
+# INFERENCE_MAX_WAITING, and get 429 with Retry-After when it is full
+INFERENCE_ADMISSION_UNIT = 'slots'
+INFERENCE_MAX_SLOTS = INFERENCE_WORKERS
+INFERENCE_MAX_TOKENS = 500000
+INFERENCE_MAX_WAITING = 16
+INFERENCE_RETRY_AFTER = 30
+
+# number of posts between flushes of an inference job's checkpoint
+INFERENCE_CHECKPOINT_INTERVAL = 25
+
+# NDJSON lines buffered for a streamed inference request, the job waits when
+# the client reads slower than posts are inferred
+INFERENCE_STREAM_BUFFER = 64
+
+# posts per page when GET /foruminference/ is paged without a page_size
+INFERENCES_PAGE_SIZE = 50
+
+# post clusters are cached per question, method and similarity rounded to
+# CLUSTER_SIMILARITY_DECIMALS, keeping at most CLUSTER_CACHE_SIZE per forum
+CLUSTER_SIMILARITY_DECIMALS = 2
+CLUSTER_CACHE_SIZE = 16
+
 QA_MODEL_NAME = 'deepset/roberta-base-squad2'
 SENT_MODEL_NAME = 'stsb-mpnet-base-v2'
 
+# models used for a request, picked with its model_tier parameter
+MODEL_TIERS = {
+    'fast': {
+        'qa_model': 'deepset/minilm-uncased-squad2',
+        'sent_model': 'all-MiniLM-L6-v2',
+    },
+    'accurate': {
+        'qa_model': QA_MODEL_NAME,
+        'sent_model': SENT_MODEL_NAME,
+    },
+}
+
+DEFAULT_MODEL_TIER = 'accurate'
+
+# replace the ML models with lightweight stubs (foruminferences/stub_models.py), for load tests
+STUB_MODELS = os.environ.get('STUB_MODELS') == '1'
+
+# append every API request to this JSON lines file, for replay with loadtest/replay.py
+REQUEST_LOG_FILE = os.environ.get('REQUEST_LOG_FILE')
+
+# load the default tier's models in the background when the server starts instead of on the first inference
+WARM_UP_MODELS = False
+
 ALLOWED_HOSTS = ['*']
 
 CORS_ALLOWED_ORIGINS = CSRF_TRUSTED_ORIGINS=[
@@ -47,6 +99,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inferencebackend.middleware.RequestLogMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
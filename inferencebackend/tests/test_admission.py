@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+from django.test import SimpleTestCase
+
+from inferencebackend.concurrency import AdmissionController, AdmissionRejected
+
+class AdmissionControllerTestCase(SimpleTestCase):
+    '''
+    Tests for admitting, queueing and rejecting inference requests
+    '''
+
+    def setUp(self):
+        self.controller = AdmissionController(capacity=4, max_waiting=2, retry_after=7)
+
+    async def wait_for(self, cost):
+        task = asyncio.create_task(self.controller.acquire(cost))
+
+        await asyncio.sleep(0) # let it join the queue
+
+        return task
+
+    async def test_admits_up_to_capacity(self):
+        self.assertEqual(await self.controller.acquire(3), 3)
+        self.assertEqual(await self.controller.acquire(1), 1)
+
+        self.assertEqual(self.controller.in_use, 4)
+
+    async def test_cost_is_clamped(self):
+        self.assertEqual(await self.controller.acquire(0), 1)
+
+        self.controller.release(1)
+
+        # a request bigger than the capacity waits for all of it, not forever
+        self.assertEqual(await self.controller.acquire(100), 4)
+
+    async def test_waits_for_release(self):
+        await self.controller.acquire(4)
+
+        waiter = await self.wait_for(2)
+
+        self.assertFalse(waiter.done())
+
+        self.controller.release(4)
+
+        self.assertEqual(await waiter, 2)
+        self.assertEqual(self.controller.in_use, 2)
+
+    async def test_first_in_first_out(self):
+        await self.controller.acquire(3)
+
+        large_waiter = await self.wait_for(4)
+        small_waiter = await self.wait_for(1)
+
+        # capacity is left for the small request, but it doesn't jump the queue
+        self.assertFalse(small_waiter.done())
+
+        self.controller.release(3)
+
+        await large_waiter
+
+        self.assertFalse(small_waiter.done())
+
+        self.controller.release(4)
+
+        await small_waiter
+
+        self.assertEqual(self.controller.in_use, 1)
+
+    async def test_rejects_when_queue_is_full(self):
+        await self.controller.acquire(4)
+
+        waiters = [await self.wait_for(1), await self.wait_for(1)]
+
+        with self.assertRaises(AdmissionRejected) as rejection:
+            await self.controller.acquire(1)
+
+        self.assertEqual(rejection.exception.retry_after, 7)
+
+        for waiter in waiters:
+            waiter.cancel()
+
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+    async def test_cancelled_while_waiting(self):
+        await self.controller.acquire(4)
+
+        waiter = await self.wait_for(2)
+        waiter.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        self.assertEqual(len(self.controller.waiting), 0)
+
+        self.controller.release(4)
+
+        self.assertEqual(self.controller.in_use, 0)
+
+    async def test_cancelled_after_admission(self):
+        await self.controller.acquire(4)
+
+        waiter = await self.wait_for(2)
+
+        # admitted by release, then cancelled before it gets to run
+        self.controller.release(4)
+        waiter.cancel()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        self.assertEqual(self.controller.in_use, 0)
+        self.assertEqual(len(self.controller.waiting), 0)
+
+    async def test_release_from_another_thread(self):
+        await self.controller.acquire(4)
+
+        waiter = await self.wait_for(1)
+
+        release_thread = threading.Thread(target=self.controller.release, args=(4,))
+        release_thread.start()
+
+        self.assertEqual(await asyncio.wait_for(waiter, timeout=5), 1)
+
+        release_thread.join()
@@ -0,0 +1,134 @@
+import base64
+import importlib.util
+import os
+import tempfile
+import uuid
+
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, LiveServerTestCase, TestCase, override_settings
+
+from inferencebackend import middleware
+
+from forums.models import Forums
+
+# loadtest/replay.py is a standalone script rather than part of a package
+replay_spec = importlib.util.spec_from_file_location('replay', os.path.join(settings.BASE_DIR, 'loadtest', 'replay.py'))
+replay = importlib.util.module_from_spec(replay_spec)
+replay_spec.loader.exec_module(replay)
+
+FORUM_CSV = b'id,parent,userid,userfullname,message\n1,0,1,User 1,"I like cats."\n'
+
+class RequestLogMixin:
+    '''
+    Sends requests through RequestLogMiddleware, logging to a temporary file
+    '''
+
+    def setUp(self):
+        super().setUp()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        self.log_file = os.path.join(directory.name, 'requests.log.jsonl')
+
+        media_root = override_settings(MEDIA_ROOT=directory.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        patcher = mock.patch.object(middleware, 'REQUEST_LOG_FILE', self.log_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # middleware is loaded on a client's first request, after the patch
+        self.client = Client()
+
+    def upload_forum(self):
+        return self.client.post('/forums/', {'file': SimpleUploadedFile('forum.csv', FORUM_CSV)}).json()['data']
+
+    def records(self):
+        return replay.read_records(self.log_file)
+
+class RequestLogMiddlewareTestCase(RequestLogMixin, TestCase):
+    '''
+    Tests for recording API requests
+    '''
+
+    def test_records(self):
+        forum_id = self.upload_forum()
+
+        self.client.get('/forums/', {'forum_id': forum_id})
+
+        upload, query = self.records()
+
+        for record in (upload, query):
+            self.assertIsInstance(record['time'], float)
+            self.assertIsInstance(record['duration'], float)
+            self.assertEqual(record['path'], '/forums/')
+            self.assertEqual(record['status'], 200)
+
+        self.assertEqual(upload['method'], 'POST')
+        self.assertEqual(upload['query'], '')
+        self.assertEqual(upload['created_id'], forum_id)
+        self.assertTrue(upload['content_type'].startswith('multipart/form-data'))
+        self.assertIn(FORUM_CSV, base64.b64decode(upload['body']))
+
+        self.assertEqual(query['method'], 'GET')
+        self.assertEqual(query['query'], f'forum_id={forum_id}')
+        self.assertEqual(query['body'], '')
+        self.assertNotIn('created_id', query)
+
+    def test_error_status(self):
+        self.client.post('/foruminference/', 'not json', content_type='application/json')
+
+        record, = self.records()
+
+        self.assertEqual(record['status'], 400)
+        self.assertEqual(record['content_type'], 'application/json')
+        self.assertEqual(base64.b64decode(record['body']), b'not json')
+        self.assertNotIn('created_id', record)
+
+    def test_skips_admin(self):
+        self.client.get('/admin/')
+
+        self.assertFalse(os.path.exists(self.log_file))
+
+    def test_unused_without_log_file(self):
+        with mock.patch.object(middleware, 'REQUEST_LOG_FILE', None):
+            with self.assertRaises(MiddlewareNotUsed):
+                middleware.RequestLogMiddleware(lambda request: None)
+
+class ReplayTestCase(RequestLogMixin, LiveServerTestCase):
+    '''
+    Tests for replaying recorded requests against a server
+    '''
+
+    def test_replay(self):
+        forum_id = self.upload_forum()
+
+        self.client.get('/forums/', {'forum_id': forum_id})
+        self.client.get('/forums/')
+        self.client.get('/forums/', {'forum_id': str(uuid.uuid4())})
+
+        records = self.records()
+
+        Forums.objects.all().delete()
+
+        replayer = replay.Replayer(self.live_server_url, timeout=30)
+        seconds = replayer.replay(records, concurrency=2)
+
+        # requests for the recorded forum are sent for the forum created on replay
+        self.assertEqual(list(replayer.id_map), [forum_id])
+        self.assertNotEqual(replayer.id_map[forum_id], forum_id)
+
+        self.assertEqual(sorted(status for _, status, _ in replayer.results), [200, 200, 200, 404])
+
+        rows = [line.split() for line in replayer.report(seconds).splitlines()[1:]]
+
+        # endpoint, count, req/s, errors, p50, p95, p99
+        self.assertEqual([row[:-6] for row in rows], [['POST', '/forums/'], ['GET', '/forums/'], ['all']])
+        self.assertEqual([row[-6] for row in rows], ['1', '3', '4'])
+        self.assertEqual([row[-4] for row in rows], ['0.0%', '33.3%', '25.0%'])
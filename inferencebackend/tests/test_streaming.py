@@ -0,0 +1,48 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from inferencebackend.concurrency import ThreadStream
+
+class ThreadStreamTestCase(SimpleTestCase):
+    '''
+    Tests for streaming items from a worker thread
+    '''
+
+    def test_stream(self):
+        stream = ThreadStream(maxsize=2)
+
+        def write():
+            for item in range(10):
+                stream.put(item)
+
+            stream.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+
+        self.assertEqual(list(stream), list(range(10)))
+
+        writer.join()
+
+    def test_abandoned_stream_doesnt_block_writer(self):
+        stream = ThreadStream(maxsize=1)
+
+        def write():
+            for item in range(10):
+                stream.put(item)
+
+            stream.close()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+
+        items = iter(stream)
+
+        self.assertEqual(next(items), 0)
+
+        items.close()
+
+        writer.join(timeout=5)
+
+        self.assertFalse(writer.is_alive())
@@ -0,0 +1,94 @@
+import asyncio
+
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
+
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.request import Request
+
+from inferencebackend.concurrency import run_blocking
+
+def too_many_requests(retry_after):
+    '''
+    429 response telling the client when to retry
+    '''
+
+    response = JsonResponse({'message': 'Too many inference requests, try again later'}, status=429)
+    response.headers['Retry-After'] = str(retry_after)
+
+    return response
+
+class AsyncStreamingHttpResponse(StreamingHttpResponse):
+    '''
+    Streaming response over a blocking iterator.
+
+    Django 4.0 iterates streaming responses on the event loop under ASGI, so
+    inferencebackend.asgi sends this response through async_streaming_content,
+    which advances the iterator on a worker thread. WSGI iterates it as usual.
+    '''
+
+    def async_streaming_content(self):
+        iterator = iter(self.streaming_content)
+
+        async def iterate():
+            done = object()
+
+            while (part := await run_blocking(next, iterator, done)) is not done:
+                yield part
+
+        return iterate()
+
+class AsyncAPIView(View):
+    '''
+    Base class for views with async handlers.
+
+    Django 4.0 only awaits function views, so the view returned by as_view is
+    marked as a coroutine function. Request bodies are parsed the same way
+    APIView does and exposed as request.data.
+    '''
+
+    parser_classes = [JSONParser, FormParser, MultiPartParser]
+
+    body_methods = ('post', 'put', 'patch', 'delete')
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        view._is_coroutine = asyncio.coroutines._is_coroutine
+        view.csrf_exempt = True
+
+        return view
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method.lower() in self.body_methods:
+            drf_request = Request(
+                request,
+                parsers=[parser() for parser in self.parser_classes]
+            )
+
+            try:
+                request.data = drf_request.data
+            except ParseError:
+                return self.invalid_request()
+            except APIException as error: # e.g. unsupported media type
+                return self.request_error(error)
+
+        return super().dispatch(request, *args, **kwargs)
+
+    async def invalid_request(self):
+        return JsonResponse({'message': 'Invalid request data'}, status=400)
+
+    async def request_error(self, error):
+        return JsonResponse({'message': str(error.detail)}, status=error.status_code)
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return super().http_method_not_allowed(request, *args, **kwargs)
+
+    async def options(self, request, *args, **kwargs):
+        response = HttpResponse()
+        response.headers['Allow'] = ', '.join(self._allowed_methods())
+        response.headers['Content-Length'] = '0'
+
+        return response
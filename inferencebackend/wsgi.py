@@ -2,6 +2,13 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from inferencebackend.settings import WARM_UP_MODELS
+
+from foruminferences.ml import start_warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'inferencebackend.settings')
 
 application = get_wsgi_application()
+
+if WARM_UP_MODELS:
+    start_warm_up() # runs in the background while the worker starts serving
@@ -0,0 +1,223 @@
+'''
+Replay recorded API traffic against a running server and report latency,
+throughput and error rate per endpoint.
+
+Record traffic by starting a server with REQUEST_LOG_FILE set (see
+inferencebackend/middleware.py), then replay it against a local server
+started with STUB_MODELS=1 so the ML models don't dominate the results:
+
+    STUB_MODELS=1 uvicorn inferencebackend.asgi:application
+    python loadtest/replay.py requests.log.jsonl --concurrency 16 --rate 50
+
+With --rate, requests that depend on each other (e.g. reading inferences
+right after creating them) can overtake one another; --speed keeps the
+recorded gaps between requests instead.
+
+Only the standard library is used, so it can run from any machine.
+'''
+
+import argparse
+import base64
+import http.client
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+def read_records(log_file):
+    '''
+    Read recorded requests, skipping blank lines
+    '''
+
+    with open(log_file) as request_log:
+        return [json.loads(line) for line in request_log if line.strip()]
+
+def percentile(latencies, percent):
+    '''
+    Nearest-rank percentile of a sorted list
+    '''
+
+    rank = max(1, round(percent / 100 * len(latencies)))
+
+    return latencies[rank - 1]
+
+class Replayer:
+    '''
+    Sends recorded requests to a server.
+
+    Ids created by recorded requests (e.g. new forums) are different on the
+    target server, so every request that created an id is sent on its own
+    once earlier requests finish, and later requests are rewritten to use the
+    new id.
+    '''
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+        self.id_map = {}
+        self.results = []
+        self.lock = threading.Lock()
+
+    def rewrite(self, text):
+        for recorded_id, new_id in self.id_map.items():
+            text = text.replace(recorded_id, new_id)
+
+        return text
+
+    def send(self, record):
+        '''
+        Send one recorded request and store (endpoint, status, latency)
+        '''
+
+        path = self.rewrite(record['path'])
+        query = self.rewrite(record.get('query') or '')
+
+        body = None
+
+        if record.get('body'):
+            body = self.rewrite(base64.b64decode(record['body']).decode('latin-1')).encode('latin-1')
+
+        request = urllib.request.Request(
+            f'{self.base_url}{path}' + (f'?{query}' if query else ''),
+            data=body,
+            method=record['method']
+        )
+
+        if record.get('content_type'):
+            request.add_header('Content-Type', record['content_type'])
+
+        start_time = time.perf_counter()
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response_body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            response_body = error.read()
+            status = error.code
+        except (urllib.error.URLError, http.client.HTTPException, OSError):
+            response_body = b''
+            status = None
+
+        latency = time.perf_counter() - start_time
+
+        if record.get('created_id') and status == 200:
+            new_id = json.loads(response_body).get('data')
+
+            self.id_map[record['created_id']] = new_id
+
+        with self.lock:
+            self.results.append((f'{record["method"]} {record["path"]}', status, latency))
+
+    def replay(self, records, concurrency, rate=0, speed=None):
+        '''
+        Replay records in order with at most `concurrency` requests in flight
+
+        Args:
+            records: recorded requests
+            concurrency: max requests in flight
+            rate: max requests started per second (0 for no limit)
+            speed (optional): instead of rate, keep the recorded gaps between
+                requests, divided by speed
+
+        Returns:
+            Seconds taken
+        '''
+
+        start_time = time.perf_counter()
+        send_time = start_time
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            in_flight = set()
+
+            for record_ind, record in enumerate(records):
+                if speed:
+                    if record_ind:
+                        send_time += max(0, record['time'] - records[record_ind - 1]['time']) / speed
+                elif rate:
+                    send_time = start_time + record_ind / rate
+
+                time.sleep(max(0, send_time - time.perf_counter()))
+
+                if record.get('created_id'):
+                    wait(in_flight)
+                    in_flight.clear()
+
+                    self.send(record)
+
+                    continue
+
+                # keep the queue bounded so the rate limit means something
+                if len(in_flight) >= concurrency * 2:
+                    done, _ = wait(in_flight, return_when='FIRST_COMPLETED')
+                    in_flight -= done
+
+                in_flight.add(executor.submit(self.send, record))
+
+        return time.perf_counter() - start_time
+
+    def report(self, seconds):
+        '''
+        Format count, throughput, error rate and latency percentiles per endpoint.
+        Requests that failed or got a 4xx/5xx status count as errors.
+        '''
+
+        endpoints = {}
+
+        for endpoint, status, latency in self.results:
+            endpoints.setdefault(endpoint, []).append((status, latency))
+
+        endpoints['all'] = [(status, latency) for _, status, latency in self.results]
+
+        lines = [
+            f'{"endpoint":<32} {"count":>7} {"req/s":>8} {"errors":>7} '
+            f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}'
+        ]
+
+        for endpoint, results in endpoints.items():
+            latencies = sorted(latency * 1000 for _, latency in results)
+            errors = sum(1 for status, _ in results if status is None or status >= 400)
+
+            lines.append(
+                f'{endpoint:<32} {len(results):>7} {len(results) / seconds:>8.2f} '
+                f'{errors / len(results):>7.1%} {percentile(latencies, 50):>8.1f} '
+                f'{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f}'
+            )
+
+        return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('log_file', help='JSON lines request log written by RequestLogMiddleware')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='server to replay against')
+    parser.add_argument('--concurrency', type=int, default=8, help='max requests in flight')
+    parser.add_argument('--rate', type=float, default=0, help='max requests started per second (0 for no limit)')
+    parser.add_argument(
+        '--speed',
+        type=float,
+        default=None,
+        help='keep the recorded gaps between requests, sped up by this factor (overrides --rate)'
+    )
+    parser.add_argument('--repeat', type=int, default=1, help='times to replay the log')
+    parser.add_argument('--timeout', type=float, default=300, help='seconds before a request fails')
+
+    args = parser.parse_args()
+
+    records = read_records(args.log_file)
+
+    if not records:
+        parser.error('request log is empty')
+
+    replayer = Replayer(args.url, args.timeout)
+
+    seconds = replayer.replay(records * args.repeat, args.concurrency, args.rate, args.speed)
+
+    print(replayer.report(seconds))
+
+if __name__ == '__main__':
+    main()